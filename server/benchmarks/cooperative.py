@@ -0,0 +1,177 @@
+"""
+Throughput and replans per step of warehouse style agents as the floor
+gets crowded, planning on their own (shortest path, wait a random
+number of steps and replan when an agent is in the way, like the
+warehouse agents) or cooperatively over a space-time reservation table
+(server/models/cooperative.py). Agents take a step to turn and a step
+to move, and carry out tasks at random shelf cells.
+
+    python -m server.benchmarks.cooperative --size 30 --density 0.02 0.05 0.1 0.2 --ticks 500
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ..models.cooperative import CooperativePlanner
+from ..models.pathfinding import DIRECTIONS, PathGrid
+
+
+class Robot():
+    def __init__(self, position: tuple[int, int], heading: int):
+        self.position = position
+        self.heading = heading
+        self.goal: tuple[int, int] | None = None
+        self.timeline: list[tuple[int, int, int]] = []   # cooperative plan, from the current tick
+        self.path: list[tuple[int, int]] = []            # independent plan, cells to visit
+        self.waiting = 0
+
+
+def run(size: int, obstacles: float, density: float, cooperative: bool, ticks: int, seed: int):
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    walkable = np_rng.random((size, size)) >= obstacles
+    grid = PathGrid(walkable)
+
+    # keep to the cells connected to the middle of the floor, shelves
+    # are blocked cells an agent can stand next to
+    middle = min(zip(*np.nonzero(walkable)), key=lambda c: abs(c[0] - size // 2) + abs(c[1] - size // 2))
+    reachable = np.array(grid.distances([(int(middle[0]), int(middle[1]))])).reshape(size, size) >= 0
+    free = [(x, y) for x in range(size) for y in range(size) if reachable[x, y]]
+    shelves = [(x, y) for x in range(size) for y in range(size) if not walkable[x, y]
+               and any(0 <= x + dx < size and 0 <= y + dy < size and reachable[x + dx, y + dy] for dx, dy in DIRECTIONS)]
+    count = max(1, int(len(free) * density))
+    robots = [Robot(cell, rng.randrange(4)) for cell in rng.sample(free, count)]
+    occupied = {robot.position: robot for robot in robots}
+
+    planner = CooperativePlanner() if cooperative else None
+    if planner is not None:
+        for robot in robots:
+            planner.reservations.hold(robot, robot.position, 0)
+
+    done = replans = plans = 0
+    planning = 0.0
+
+    def plan(robot: Robot, t: int, avoid_agents: bool, delay: int = 0):
+        nonlocal plans, planning
+        plans += 1
+        start = time.perf_counter()
+        if planner is not None:
+            timeline = planner.plan(robot, grid, robot.position, robot.heading, robot.goal, t, delay=delay)
+            if timeline is None:
+                # boxed in, hold the cell and wait like the warehouse
+                # agents, robots that had planned through it plan again
+                robot.timeline = []
+                robot.waiting, displaced = planner.fallback(robot, robot.position, t, rng)
+                for other in displaced:
+                    other.timeline = []
+            else:
+                robot.timeline = timeline[1:]
+        else:
+            cells = grid
+            if avoid_agents:
+                blocked = walkable.copy()
+                for cell in occupied:
+                    if cell != robot.position:
+                        blocked[cell] = False
+                cells = PathGrid(blocked)
+            path = cells.astar(robot.position, robot.goal)
+            robot.path = path[1:-1] if path else []
+        planning += time.perf_counter() - start
+
+    for t in range(ticks):
+        for robot in robots:
+            if robot.waiting:
+                robot.waiting -= 1
+                continue
+
+            if robot.goal is None:
+                robot.goal = rng.choice(shelves)
+                plan(robot, t, avoid_agents=False)
+
+            x, y = robot.position
+            dx, dy = DIRECTIONS[robot.heading]
+
+            if planner is not None:
+                if not robot.timeline:
+                    if (x + dx, y + dy) == robot.goal:
+                        done += 1
+                        robot.goal = None
+                        continue
+                    # the last search gave up, try again
+                    plan(robot, t, avoid_agents=True)
+                    if not robot.timeline:
+                        continue
+
+                nx, ny, heading = robot.timeline[0]
+                if (nx, ny) != robot.position and (nx, ny) in occupied:
+                    # someone is off their plan, plan around it and wait
+                    # first if the table doesn't know where it stands
+                    replans += 1
+                    known = planner.reservations.owner((nx, ny), t) is occupied[(nx, ny)]
+                    plan(robot, t, avoid_agents=True, delay=0 if known else rng.randint(1, planner.max_backoff))
+                    continue
+                robot.timeline.pop(0)
+                robot.heading = heading
+            else:
+                if not robot.path:
+                    goal_heading = DIRECTIONS.index((robot.goal[0] - x, robot.goal[1] - y)) \
+                        if (robot.goal[0] - x, robot.goal[1] - y) in DIRECTIONS else None
+                    if goal_heading is None:
+                        replans += 1
+                        plan(robot, t, avoid_agents=True)
+                    elif goal_heading != robot.heading:
+                        robot.heading = goal_heading
+                    else:
+                        done += 1
+                        robot.goal = None
+                    continue
+
+                nx, ny = robot.path[0]
+                heading = DIRECTIONS.index((nx - x, ny - y))
+                if heading != robot.heading:
+                    robot.heading = heading
+                    continue
+                if (nx, ny) in occupied:
+                    replans += 1
+                    robot.waiting = rng.choice(range(5))
+                    plan(robot, t, avoid_agents=True)
+                    continue
+                robot.path.pop(0)
+
+            if (nx, ny) != robot.position:
+                del occupied[robot.position]
+                robot.position = (nx, ny)
+                occupied[robot.position] = robot
+
+    return {
+        'agents': count,
+        'throughput': done / ticks * 100,
+        'replans': replans / ticks,
+        'plan_ms': planning / max(plans, 1) * 1e3,
+        'failures': planner.failures if planner is not None else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=30)
+    parser.add_argument("--obstacles", type=float, default=0.1, help="fraction of shelf cells")
+    parser.add_argument("--density", type=float, nargs="+", default=[0.02, 0.05, 0.1], help="agents per free cell")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("throughput is tasks done per 100 steps, failures are cooperative searches that gave up")
+    print(f"{'density':>8} {'agents':>7} {'planner':>12} {'throughput':>11} {'replans/step':>13} {'plan ms':>8} {'failures':>9}")
+    for density in args.density:
+        for cooperative in (False, True):
+            r = run(args.size, args.obstacles, density, cooperative, args.ticks, args.seed)
+            name = "cooperative" if cooperative else "independent"
+            print(f"{density:>8.2f} {r['agents']:>7} {name:>12} {r['throughput']:>11.1f} {r['replans']:>13.2f} "
+                  f"{r['plan_ms']:>8.2f} {r['failures']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Incidents handled per minute under a burst of suspicious reports.
+
+Runs the guard's scheduling pieces (IncidentManager + DroneFleet) on a
+simulated clock, drones take distance / speed seconds to reach a camera
+plus the pause DroneManager.cs makes at the destination.
+
+    python -m server.benchmarks.incidents --burst 200 --duplicates 3
+"""
+import argparse
+import random
+import time
+
+from ..models.incidents import IncidentManager
+from ..v2 import DroneFleet, DroneState
+
+DRONE_SPEED = 10.0      # DroneManager.speed
+PAUSE_DURATION = 8.0    # DroneManager.pauseDuration
+
+
+def run(drones: int, max_parallel: int | None, burst: int, duplicates: int, size: float, seed: int, dt: float = 1.0):
+    rng = random.Random(seed)
+    now = 0.0
+    incidents = IncidentManager(max_parallel=max_parallel, clock=lambda: now)
+    fleet = DroneFleet(verbose=False)  # no debug line per drone in the table
+
+    cameras = {f"cam{i}": (rng.uniform(0, size), 0.0, rng.uniform(0, size)) for i in range(burst)}
+    for i in range(drones):
+        fleet.update_position(f"drone{i}", (rng.uniform(0, size), 0.0, rng.uniform(0, size)))
+
+    # every camera is reported several times, in random order
+    reports = [camera_id for camera_id in cameras for _ in range(duplicates)]
+    rng.shuffle(reports)
+    for camera_id in reports:
+        incidents.report(camera_id, rng.random())
+
+    arrivals: dict[str, float] = {}
+    schedule_time = 0.0
+
+    while incidents.open:
+        start = time.perf_counter()
+
+        for drone_id, incident in list(incidents.dispatched.items()):
+            if arrivals[drone_id] <= now:
+                drone = fleet.get(drone_id)
+                drone.status = DroneState.IDLE
+                fleet.update_position(drone_id, cameras[incident.camera_id])
+                incidents.resolve(incident, alarmed=False)
+
+        while incidents.can_dispatch():
+            incident = incidents.peek()
+            if incident is None:
+                break
+
+            target = cameras[incident.camera_id]
+            drone = fleet.nearest_available(target)
+            if drone is None:
+                break
+
+            distance = sum((a - b) ** 2 for a, b in zip(fleet.positions.points[drone.id], target)) ** 0.5
+            move_id = drone.moved(incident.camera_id, distance)
+            arrivals[drone.id] = now + distance / DRONE_SPEED + PAUSE_DURATION
+            incidents.dispatch(incident, drone.id, move_id)
+
+        schedule_time += time.perf_counter() - start
+        now += dt
+
+    return len(incidents.resolved), now, incidents.duplicates, schedule_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200, help="distinct suspicious cameras in the burst")
+    parser.add_argument("--duplicates", type=int, default=3, help="reports per camera")
+    parser.add_argument("--size", type=float, default=200.0, help="side of the square area in units")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'drones':>6} {'parallel':>8} {'handled':>8} {'sim min':>8} {'inc/min':>8} {'deduped':>8} {'sched ms':>9}")
+    for drones in (1, 2, 4, 8):
+        for max_parallel in (1, None):
+            handled, elapsed, deduped, schedule_time = run(drones, max_parallel, args.burst, args.duplicates, args.size, args.seed)
+            minutes = elapsed / 60
+            print(f"{drones:>6} {str(max_parallel or 'all'):>8} {handled:>8} {minutes:>8.1f} {handled / minutes:>8.1f} {deduped:>8} {schedule_time * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Paths per second of the warehouse path searches on large floors: the
+list.pop(0) BFS the agents used to run, and the deque BFS, A* and jump
+point search of server/models/pathfinding.py.
+
+    python -m server.benchmarks.pathfinding --sizes 200 1000 --obstacles 0 0.2
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ..models.pathfinding import DIRECTIONS, PathGrid
+
+
+def legacy_bfs(walkable: list[list[bool]], start: tuple[int, int], goal: tuple[int, int]) -> list[tuple[int, int]] | None:
+    """The search Agent.calculate_path used to run"""
+    n, m = len(walkable), len(walkable[0])
+    queue = [start]
+    visited = {start}
+    parents = {}
+    while queue:
+        x, y = queue.pop(0)
+        if (x, y) == goal:
+            path = [goal]
+            while path[-1] != start:
+                path.append(parents[path[-1]])
+            return path[::-1]
+
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < n and 0 <= ny < m and (nx, ny) not in visited:
+                if walkable[nx][ny] or (nx, ny) == goal:
+                    queue.append((nx, ny))
+                    visited.add((nx, ny))
+                    parents[(nx, ny)] = (x, y)
+    return None
+
+
+def rate(search, pairs, budget: float) -> float:
+    """Paths per second, stopping after budget seconds"""
+    start = time.perf_counter()
+    done = 0
+    for a, b in pairs:
+        search(a, b)
+        done += 1
+        if time.perf_counter() - start > budget:
+            break
+    return done / (time.perf_counter() - start)
+
+
+def run(size: int, obstacles: float, queries: int, budget: float, seed: int):
+    rng = np.random.default_rng(seed)
+    walkable = rng.random((size, size)) >= obstacles
+    free = np.argwhere(walkable)
+    picks = free[rng.integers(len(free), size=(queries, 2))]
+    pairs = [(tuple(map(int, a)), tuple(map(int, b))) for a, b in picks]
+
+    grid = PathGrid(walkable)
+    objects = walkable & (rng.random((size, size)) < 0.001)
+
+    # every search must find paths of the same length
+    for a, b in pairs[:5]:
+        lengths = {len(p) if p else None for p in (grid.astar(a, b), grid.jps(a, b), grid.bfs_nearest(a, {b}))}
+        assert len(lengths) == 1, lengths
+
+    rates = {
+        'bfs': rate(lambda a, b: grid.bfs_nearest(a, {b}), pairs, budget),
+        'nearest': rate(lambda a, b: grid.bfs_nearest(a, objects), pairs, budget),
+        'astar': rate(grid.astar, pairs, budget),
+        'jps': rate(grid.jps, pairs, budget),
+        'build': rate(lambda a, b: PathGrid(walkable), pairs, budget),
+        'tables': rate(lambda a, b: PathGrid(walkable)._jump_tables(), pairs[:3], budget),
+    }
+    if size <= 300:
+        nested = walkable.tolist()
+        rates['legacy'] = rate(lambda a, b: legacy_bfs(nested, a, b), pairs, budget)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--obstacles", type=float, nargs="+", default=[0.0, 0.2], help="fraction of blocked cells")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds per search kind")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("paths/s, legacy only measured up to 300x300. build and tables are PathGrid")
+    print("constructions and jump point table precomputations per second")
+    print(f"{'floor':>11} {'blocked':>8} {'legacy':>8} {'bfs':>8} {'nearest':>8} {'astar':>8} {'jps':>8} {'build':>9} {'tables':>8}")
+    for size in args.sizes:
+        for obstacles in args.obstacles:
+            r = run(size, obstacles, args.queries, args.budget, args.seed)
+            legacy = f"{r['legacy']:>8.1f}" if 'legacy' in r else f"{'-':>8}"
+            print(f"{f'{size}x{size}':>11} {obstacles:>8.2f} {legacy} {r['bfs']:>8.1f} {r['nearest']:>8.1f} "
+                  f"{r['astar']:>8.1f} {r['jps']:>8.1f} {r['build']:>9.1f} {r['tables']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
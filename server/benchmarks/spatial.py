@@ -0,0 +1,82 @@
+"""
+Query latency of the spatial grid the cameras and the drone fleet are
+indexed in, against a linear scan.
+
+    python -m server.benchmarks.spatial --cameras 1000 5000
+"""
+import argparse
+import math
+import random
+import time
+
+from ..models.spatial import SpatialGrid
+
+
+def timed(fn, queries) -> float:
+    """Average microseconds per call"""
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def run(cameras: int, size: float, k: int, radius: float, queries: int, seed: int):
+    rng = random.Random(seed)
+    grid = SpatialGrid()
+    points = {f"cam{i}": (rng.uniform(0, size), rng.uniform(0, 5), rng.uniform(0, size)) for i in range(cameras)}
+
+    start = time.perf_counter()
+    for key, point in points.items():
+        grid.insert(key, point)
+    insert_us = (time.perf_counter() - start) / cameras * 1e6
+
+    # cameras following their targets move a little every capture
+    moved = {key: (x + rng.uniform(-1, 1), y, z + rng.uniform(-1, 1)) for key, (x, y, z) in points.items()}
+    start = time.perf_counter()
+    for key, point in moved.items():
+        grid.insert(key, point)
+    update_us = (time.perf_counter() - start) / cameras * 1e6
+    points = moved
+
+    targets = [(rng.uniform(0, size), 0.0, rng.uniform(0, size)) for _ in range(queries)]
+
+    def scan_k(q):
+        return sorted(points, key=lambda key: math.dist(q, points[key]))[:k]
+
+    def scan_radius(q):
+        return [key for key, p in points.items() if math.dist(q, p) <= radius]
+
+    # the index must agree with a plain scan, also far outside the area
+    far = [(-100 * size, 0.0, size / 2), (50 * size, 0.0, 50 * size)]
+    for q in targets[:20] + far:
+        assert grid.k_nearest(q, k) == scan_k(q)
+        assert sorted(grid.within(q, radius)) == sorted(scan_radius(q))
+
+    return {
+        'insert': insert_us,
+        'update': update_us,
+        'knn': timed(lambda q: grid.k_nearest(q, k), targets),
+        'knn_scan': timed(scan_k, targets[:50]),
+        'radius': timed(lambda q: grid.within(q, radius), targets),
+        'radius_scan': timed(scan_radius, targets[:50]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--size", type=float, default=1000.0, help="side of the square area in units")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--radius", type=float, default=25.0)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'cameras':>8} {'insert us':>10} {'update us':>10} {'knn us':>8} {'scan us':>9} {'radius us':>10} {'scan us':>9}")
+    for cameras in args.cameras:
+        r = run(cameras, args.size, args.k, args.radius, args.queries, args.seed)
+        print(f"{cameras:>8} {r['insert']:>10.2f} {r['update']:>10.2f} {r['knn']:>8.1f} {r['knn_scan']:>9.1f} {r['radius']:>10.1f} {r['radius_scan']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
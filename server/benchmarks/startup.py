@@ -0,0 +1,77 @@
+"""
+Cold start of the server modules, each measured in a fresh interpreter.
+
+    python -m server.benchmarks.startup --budget 250
+
+Fails (exit code 1) when a scenario goes over the budget in milliseconds,
+or when it pulls in a vision dependency it should not need.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# vision/plotting modules that must not be imported until they are used
+HEAVY = ("openai", "PIL", "imagehash", "matplotlib")
+
+SCENARIOS = {
+    'import server.v2': "import server.v2",
+    'build agents': (
+        "import server.v2 as v2\n"
+        "from server.models.ee import MockEmitter\n"
+        "conn = MockEmitter()\n"
+        "drone = v2.DroneAgent(conn)\n"
+        "guard = v2.GuardAgent(drone, conn)\n"
+        "drone.frame_decoder.shutdown()\n"
+    ),
+    'build simulation': (
+        "import server.v2 as v2\n"
+        "sim = v2.Simulation(metrics_port=None)\n"
+        "sim.drone.frame_decoder.shutdown()\n"
+    ),
+    'import spatial index': "import server.models.spatial",
+    'import reporting': "import server.report",
+}
+
+TEMPLATE = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{body}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(code: str, repeat: int) -> tuple[float, list[str]]:
+    """Best of repeat runs in milliseconds, and the heavy modules loaded"""
+    body = "\n".join("    " + line for line in code.splitlines())
+    script = TEMPLATE.format(body=body, heavy=HEAVY)
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        best = min(best, result['ms'])
+        heavy = result['heavy']
+    return best, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=250.0, help="milliseconds allowed per scenario")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'scenario':<22} {'ms':>8}  heavy modules")
+    for name, code in SCENARIOS.items():
+        ms, heavy = measure(code, args.repeat)
+        over = ms > args.budget or bool(heavy)
+        failed = failed or over
+        print(f"{name:<22} {ms:>8.1f}  {', '.join(heavy) or '-'}{'  OVER BUDGET' if over else ''}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cost of the per step warehouse queries (objects in the floor, is the
+warehouse sorted) as the floor grows: the nested list scan they used to
+do, a scan of the occupancy grid codes, and the incremental counters.
+
+    python -m server.benchmarks.warehouse_counters --sizes 100 300 1000
+"""
+import argparse
+import random
+import time
+
+from ..models.grid import OccupancyGrid
+
+FREE = "FREE"
+
+
+class Object():
+    pass
+
+
+class Agent():
+    def __init__(self):
+        self.inventory = None
+
+
+def timed(fn, repeat: int) -> float:
+    """Average microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(size: int, density: float, agents: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    grid = OccupancyGrid((size, size, 1), FREE, (Object, Agent))
+    nested = [[FREE for _ in range(size)] for _ in range(size)]
+    crew = [Agent() for _ in range(agents)]
+
+    floor_objects = 0
+    for x in range(size):
+        for y in range(size):
+            if rng.random() < density:
+                obj = Object()
+                grid.set(0, x, y, obj)
+                nested[x][y] = obj
+                floor_objects += 1
+    carried_objects = 0
+
+    def list_scan():
+        count = 0
+        for row in nested:
+            for element in row:
+                if isinstance(element, Object):
+                    count += 1
+        return count == 0 and not any(agent.inventory is not None for agent in crew)
+
+    def grid_scan():
+        return grid.count(Object) == 0 and not any(agent.inventory is not None for agent in crew)
+
+    def counters():
+        return floor_objects == 0 and carried_objects == 0
+
+    assert list_scan() == grid_scan() == counters()
+    return {
+        'list': timed(list_scan, max(1, repeat // 10)),
+        'grid': timed(grid_scan, repeat),
+        'counter': timed(counters, repeat * 100),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--density", type=float, default=0.01, help="fraction of cells holding an object")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'floor':>11} {'list scan us':>13} {'grid scan us':>13} {'counters us':>12}")
+    for size in args.sizes:
+        r = run(size, args.density, args.agents, args.repeat, args.seed)
+        print(f"{f'{size}x{size}':>11} {r['list']:>13.1f} {r['grid']:>13.1f} {r['counter']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,23 @@
 import random
 import os
-import base64
 import uuid
-from openai import OpenAI
+import threading
 
 from enum import Enum
-from typing import Any
-from copy import copy
-from dotenv import load_dotenv
+from collections import deque
+from typing import TYPE_CHECKING, Any
 
 from models.storage import Storage
 from models.eventemmiter import EventEmitter
 from models.object import Object
+from models.grid import BeliefMap, OccupancyGrid
+from models.pathfinding import DIRECTIONS, PathGrid
+from models.fields import DistanceFields
+from models.scanner import ObjectScanner
+from models.cooperative import CooperativePlanner
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
 
 class InsufficientStorage(Exception):
     pass
@@ -19,12 +25,17 @@ class InsufficientStorage(Exception):
 class InvalidHeight(Exception):
     pass
 
+class InconsistentCounters(Exception):
+    pass
+
 class SpaceState(Enum):
     FREE_SPACE = 1
     OUT_OF_BOUNDS = 2
 
 class Warehouse():
-    def __init__(self, dimensions: tuple[int, int, int], ee: EventEmitter):
+    def __init__(self, dimensions: tuple[int, int, int], ee: EventEmitter, check_consistency: bool = False,
+                 scanner: ObjectScanner | None = None, workers: int = 0, cooperative: bool = False,
+                 headless: bool = False):
         self.dimensions = dimensions
         x, y, z = dimensions
         self.capacity = 0
@@ -32,52 +43,134 @@ class Warehouse():
         self.agents: list[Agent] = []
         self.storages: list[Storage] = [] 
         self.step_n = 0
+
+        # object classes (image names without the extension), read
+        # from server/objects once when the objects are seeded
+        self.object_classes: list[str] = []
+        # storages of every class that still have room, in attach
+        # order. full ones are dropped from the front as they are found
+        self.free_storages: dict[str, deque[Storage]] = {}
+
+        # labels objects for every agent, with one client and a
+        # label per image source. nothing is sent until the first scan
+        self.scanner = scanner or ObjectScanner()
+
+        # headless runs print nothing, pair them with an emitter
+        # from models.headless instead of the live one
+        self.verbose = not headless
+
+        # with workers > 0 agents plan concurrently, see step_parallel
+        self.workers = workers
+        self._pool: 'ThreadPoolExecutor' | None = None
+        # moves that lost a conflict and were retried the next step
+        self.conflicts = 0
+        # guards what agents share while planning concurrently
+        self.lock = threading.Lock()
+
+        # when cooperative, agents reserve their paths in space and
+        # time and plan around each other instead of bumping into
+        # each other and replanning
+        self.planner = CooperativePlanner() if cooperative else None
+
         self.id = str(uuid.uuid4())
         
         # a list of points, (step, objects in the floor)
         self.time_series: list[tuple[int, int]] = []
 
+        # kept up to date on seed, pick up and store so the
+        # per step queries don't have to scan the floor
+        self.floor_objects = 0
+        self.carried_objects = 0
+        # when set, counters are checked against a full scan every step
+        self.check_consistency = check_consistency
+
         # generate an empty map. may contain none, storage or object
         # to access a given floor map, use self.map[level]
         # to access a given position, use self.map[level][x][y]
-        self.map: list[list[list[SpaceState | Storage | Object | Agent]]] = [[[SpaceState.FREE_SPACE for _ in range(y)] for _ in range(x)] for _ in range(z)]
+        # cells are kept as integer codes, see OccupancyGrid
+        self.map = OccupancyGrid(dimensions, SpaceState.FREE_SPACE, (Storage, Object, Agent))
 
         # generate a static map that will never be modified. This
         # is what is going to be handed out to the agents initially
-        self.static_map: list[list[list[SpaceState | Storage | Object | Agent]]] = [[[SpaceState.FREE_SPACE for _ in range(y)] for _ in range(x)] for _ in range(z)]
+        self.static_map = OccupancyGrid(dimensions, SpaceState.FREE_SPACE, (Storage, Object, Agent))
+
+        # distance from every floor cell to each storage, agents
+        # walk down these instead of searching for a path
+        self.fields = DistanceFields(self.map, Agent)
         
         # emit an event to notify client of
         # warehouse being attached
         self.ee.send_event("warehouse_attached", [self.id, x, y, z])
 
-    def count_objects_floor(self):
-        base_map = self.map[0]
-        count = 0
-        for row in base_map:
-            for element in row:
-                if isinstance(element, Object):
-                    count += 1
+    def log(self, *args: Any):
+        if self.verbose:
+            print(*args)
 
-        return count
+    def count_objects_floor(self):
+        return self.floor_objects
 
     def is_sorted(self):
-        base_map = self.map[0]
-        global are_there_objects
-        global agents_have_objects
+        return self.floor_objects == 0 and self.carried_objects == 0
+
+    def object_picked(self, position: tuple[int, int, int]):
+        self.floor_objects -= 1
+        self.carried_objects += 1
+        # the cell is free now, patch the distance fields
+        self.fields.opened(position[0], position[1])
+
+    def object_stored(self):
+        self.carried_objects -= 1
+
+    # label every object in the floor in the background, so
+    # agents picking them up don't wait for the vision model
+    def prefetch_labels(self):
+        objects = [v for v in self.map.occupants.values() if isinstance(v, Object)]
+        self.scanner.prefetch(obj.image_src for obj in objects)
+
+    # split the storages between the object classes, in attach
+    # order, the first classes get one more when it doesn't divide
+    def assign_storages(self):
+        objects = len(self.object_classes)
+        spots = len(self.storages)
+        extras = spots % objects
+        equals = (spots - extras) // objects
 
-        are_there_objects = False
+        self.free_storages = {}
+        start = 0
+        for i, key in enumerate(self.object_classes):
+            count = equals + (1 if i < extras else 0)
+            storages = self.storages[start:start + count]
+            start += count
+            self.free_storages[key] = deque(s for s in storages if not s.is_full())
 
-        for row in base_map:
-            for element in row:
-                if isinstance(element, Object):
-                    are_there_objects = True
+            self.log("STORAGES: ", key)
+            for s in storages:
+                self.log("\t", s.location, s)
 
-        agents_have_objects = False
-        for agent in self.agents:
-            if agent.inventory is not None:
-                agents_have_objects = True
+    # first storage of the class with room left, O(1) amortised
+    # as storages only ever fill up
+    def storage_for(self, key: str) -> Storage:
+        with self.lock:
+            free = self.free_storages[key]
+            while free and free[0].is_full():
+                free.popleft()
+
+            if not free:
+                raise Exception("No space left")
+
+            return free[0]
+
+    # compare the counters with a full scan of the floor
+    # and the inventories, raises if they drifted apart
+    def verify_counters(self):
+        floor_objects = self.map.count(Object)
+        carried_objects = sum(1 for agent in self.agents if agent.inventory is not None)
 
-        return not are_there_objects and not agents_have_objects
+        if (floor_objects, carried_objects) != (self.floor_objects, self.carried_objects):
+            raise InconsistentCounters(
+                f"Counted {floor_objects} objects in the floor and {carried_objects} carried, "
+                f"counters say {self.floor_objects} and {self.carried_objects}"
+            )
 
     # Attaches a storage to it's specified location
     # and keeps capacity information up to date
@@ -85,7 +178,7 @@ class Warehouse():
         x, y, z = s.location
 
         # if we are going to overwrite, subtract capacity
-        if self.map[z][x][y] != SpaceState.FREE_SPACE:
+        if self.map.get(z, x, y) != SpaceState.FREE_SPACE:
             raise Exception("Placing storage in occupied space")
         
         self.storages.append(s)
@@ -94,6 +187,10 @@ class Warehouse():
         self.update_maps((x, y, z), s)
         self.capacity += s.capacity
 
+        # storages attached after seeding change the partition
+        if self.object_classes:
+            self.assign_storages()
+
         # emit an event to notify client of storage being
         # attached
         self.ee.send_event("storage_attached", [s.id, x, y, z])
@@ -108,6 +205,9 @@ class Warehouse():
             raise InsufficientStorage(f"Make sure to attach more storage with attach_storage before seeding")
 
         object_srcs = os.listdir("server/objects")
+        self.object_classes = [src.split(".")[0] for src in object_srcs]
+        self.assign_storages()
+
         # the sources to the images 
         x, y, _ = self.dimensions
 
@@ -124,6 +224,7 @@ class Warehouse():
             obj = Object((xrandom, yrandom, 0), random.choice(object_srcs))
 
             self.update_maps((xrandom, yrandom, 0), obj)
+            self.floor_objects += 1
             
             # emit an event to notify the client of a
             # random object being placed
@@ -143,7 +244,9 @@ class Warehouse():
             agent = Agent(self, (xrandom, yrandom, 0), i)
             
             self.agents.append(agent)
-            self.map[0][xrandom][yrandom] = agent
+            self.map.set(0, xrandom, yrandom, agent)
+            if self.planner is not None:
+                self.planner.reservations.hold(agent, (xrandom, yrandom), self.step_n)
 
             # emit an event to notify the client of a
             # random object being placed
@@ -157,10 +260,10 @@ class Warehouse():
             raise InvalidHeight("Provided height was higher than map height")
         
         # each array represents the columns of things around the position
-        left = [self.map[z][x - 1][y] for z in range(z_space)] if x - 1 >= 0 and x - 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
-        right = [self.map[z][x + 1][y] for z in range(z_space)] if x + 1 >= 0 and x + 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
-        front = [self.map[z][x][y + 1] for z in range(z_space)] if y + 1 >= 0 and y + 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
-        back = [self.map[z][x][y - 1] for z in range(z_space)] if y - 1 >= 0 and y - 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        left = self.map.column(x - 1, y) if x - 1 >= 0 and x - 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        right = self.map.column(x + 1, y) if x + 1 >= 0 and x + 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        front = self.map.column(x, y + 1) if y + 1 >= 0 and y + 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        back = self.map.column(x, y - 1) if y - 1 >= 0 and y - 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
 
         return {
             "front": front,
@@ -171,6 +274,9 @@ class Warehouse():
     
     # advance the warehouse simulation by one step
     def step(self):
+        if self.workers > 0:
+            return self.step_parallel()
+
         for agent in self.agents:
             surroundings = self.get_surroundings(agent.position)
 
@@ -178,6 +284,48 @@ class Warehouse():
             agent.plan() # decide what to do
             agent.step() # execute the last decision made
 
+        self.end_step()
+
+    @property
+    def pool(self) -> 'ThreadPoolExecutor':
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    # advance the simulation by one step in three phases:
+    # 1. every agent perceives the map as it was before anyone moved
+    # 2. agents plan concurrently, only touching their own belief
+    #    maps, so pathfinding and vision scans overlap
+    # 3. actions are committed one agent at a time, in a fixed
+    #    order. an action that conflicts with one committed earlier
+    #    in the step (same cell, object already picked, storage now
+    #    full) is held back and the agent retries it next step
+    def step_parallel(self):
+        frozen = [self.get_surroundings(agent.position) for agent in self.agents]
+        for agent, surroundings in zip(self.agents, frozen):
+            agent.perceive(surroundings)
+
+        # list() so exceptions raised while planning surface here
+        list(self.pool.map(lambda agent: agent.plan(), self.agents))
+
+        reservations: dict[tuple[int, int], Agent] = {}
+        for agent in self.agents:
+            if agent.reserve(reservations):
+                agent.step()
+            else:
+                self.conflicts += 1
+                agent.held_back()
+
+        self.end_step()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.scanner.close()
+
+    def end_step(self):
         # emit an event to notify the client of
         # a step being completed
         self.ee.send_event("step_completed", [self.step_n])
@@ -186,10 +334,20 @@ class Warehouse():
 
         self.time_series.append((self.step_n, self.count_objects_floor()))
 
+        if self.check_consistency:
+            self.verify_counters()
+
     def update_maps(self, position: tuple[int, int, int], v: Any):
         x, y, z = position
-        self.static_map[z][x][y] = v
-        self.map[z][x][y] = v
+        self.static_map.set(z, x, y, v)
+        self.map.set(z, x, y, v)
+        # new storage or object, fields are rebuilt when next used
+        self.fields.invalidate()
+
+    # build the distance field of every storage up front, so
+    # the first agents to carry an object don't pay for it
+    def precompute_fields(self):
+        self.fields.precompute([s.location[:2] for s in self.storages])
 
     def create_stats_graph(self):
         import matplotlib.pyplot as plt
@@ -271,7 +429,9 @@ class Step():
 
 class Agent():
     def __init__(self, warehouse: Warehouse, initial_position: tuple[int, int, int], n: int):
-        self.map = copy(warehouse.static_map)
+        # what this agent believes, on top of the static map
+        # shared by every agent
+        self.map = BeliefMap(warehouse.static_map)
         self.initial_position = initial_position
         self.position = initial_position
         self.warehouse = warehouse
@@ -285,6 +445,17 @@ class Agent():
         self.time_series: list[tuple[int, int]] = []
         self.store_count = 0
         self.move_count = 0
+        # plans thrown away because something got in the way
+        self.replans = 0
+        # cooperative agents: the cell their movement ends next to,
+        # and the step to search again after no plan was found
+        self.goal: tuple[int, int] | None = None
+        self.replan_at: int | None = None
+        # cells an agent that found no plan needs, this one is parked
+        # on the way or next to its goal and should leave them
+        self.make_way: set[tuple[int, int]] = set()
+        # own generator, so concurrent planning stays reproducible
+        self.rng = random.Random(random.getrandbits(32))
 
     # get the current perception at a given position, based on the 
     # current map the agent has
@@ -298,10 +469,10 @@ class Agent():
         # each array represents the columns of things around the position
         # there can be instances of 'Object', 'Storage' a 0 representing a
         # wall/limit and a 1 representing empty floor
-        left = [self.map[z][x - 1][y] for z in range(z_space)] if x - 1 >= 0 and x - 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
-        right = [self.map[z][x + 1][y] for z in range(z_space)] if x + 1 >= 0 and x + 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
-        front = [self.map[z][x][y + 1] for z in range(z_space)] if y + 1 >= 0 and y + 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
-        back = [self.map[z][x][y - 1] for z in range(z_space)] if y - 1 >= 0 and y - 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        left = self.map.column(x - 1, y) if x - 1 >= 0 and x - 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        right = self.map.column(x + 1, y) if x + 1 >= 0 and x + 1 < x_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        front = self.map.column(x, y + 1) if y + 1 >= 0 and y + 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
+        back = self.map.column(x, y - 1) if y - 1 >= 0 and y - 1 < y_space else [SpaceState.OUT_OF_BOUNDS for _ in range(z_space)]
 
         return {
             "front": front,
@@ -324,7 +495,7 @@ class Agent():
         x, y, _ = self.position
 
         if current_left != previous_left:
-            print(f"[A{self.id}] fixing left!")
+            self.warehouse.log(f"[A{self.id}] fixing left!")
             # we need to fix our perception at the left!
             for z in range(z_space):
                 if current_left[z] != previous_left[z]:
@@ -337,7 +508,7 @@ class Agent():
 
 
         if current_right != previous_right:
-            print(f"[A{self.id}] fixing right!")
+            self.warehouse.log(f"[A{self.id}] fixing right!")
             # we need to fix our perception at the right!
             for z in range(z_space):
                 if current_right[z] != previous_right[z]:
@@ -349,7 +520,7 @@ class Agent():
                     self.map[z][x + 1][y] = current_right[z]
 
         if current_front != previous_front:
-            print(f"[A{self.id}] fixing front!")
+            self.warehouse.log(f"[A{self.id}] fixing front!")
             # we need to fix our perception at the front!
             for z in range(z_space):
                 if current_front[z] != previous_front[z]:
@@ -361,7 +532,7 @@ class Agent():
                     self.map[z][x][y + 1] = current_front[z]
 
         if current_back != previous_back:
-            print(f"[A{self.id}] fixing back!")
+            self.warehouse.log(f"[A{self.id}] fixing back!")
             # we need to fix our perception at the back!
             for z in range(z_space):
                 if current_back[z] != previous_back[z]:
@@ -379,23 +550,26 @@ class Agent():
         # this will use the available information
         # to make a plan or decision on what to do
         # this will depend on the current state of the agent
-        print(f"Agent {self.id} is planning...")
+        self.warehouse.log(f"Agent {self.id} is planning...")
 
         # if there are no planned steps
         if len(self.planned_steps) == 0:
+            self.replan_at = None
             if self.state == AgentState.STANDBY:
                 try:
                     path, object = self.get_path_to_object()
                 except:
-                    # we can probably safely exit?
-                    self.planned_steps = [Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY }), Step(AgentAction.WAIT, None)]
+                    # we can probably safely exit? unless parked
+                    # where another agent needs to get to
+                    self.planned_steps = [Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY })] + (self.step_aside() or [Step(AgentAction.WAIT, None)])
                     return
+                self.make_way = set()
 
-                print("planning to go to object", object)
-                print("path: ", path)
+                self.warehouse.log("planning to go to object", object)
+                self.warehouse.log("path: ", path)
 
                 initial_steps = [Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.MOVING_TO_OBJECT })]
-                movement_steps = self.path_to_movement(path)
+                movement_steps = self.plan_movement(path)
                 pickup_steps = [
                     Step(AgentAction.PICK_UP, { "object": object }), # pick up the object
                     Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.CARRYING_OBJECT }) # change agent state to carrying object
@@ -407,9 +581,9 @@ class Agent():
                 # 3. pickup object and set state to MOVING_OBJECT
                 self.planned_steps = initial_steps + movement_steps + pickup_steps
 
-                print("Planned steps")
+                self.warehouse.log("Planned steps")
                 for step in self.planned_steps:
-                    print(f"\t{step.action} - {step.params}")
+                    self.warehouse.log(f"\t{step.action} - {step.params}")
             
             if self.state == AgentState.MOVING_TO_OBJECT:
                 raise Exception("Invalid state. Agent should have at least one step if on this state")
@@ -421,11 +595,11 @@ class Agent():
 
                 path, storage = self.get_path_to_storage(self.inventory)
 
-                print("Path to storage calculated:")
-                print(path)
-                print(storage)
+                self.warehouse.log("Path to storage calculated:")
+                self.warehouse.log(path)
+                self.warehouse.log(storage)
 
-                movement_steps = self.path_to_movement(path)
+                movement_steps = self.plan_movement(path)
                 store_steps = [
                     Step(AgentAction.STORE, { "storage": storage }),
                     Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY })
@@ -436,11 +610,16 @@ class Agent():
                 # 2. Store object and set new state to standby
                 self.planned_steps = movement_steps + store_steps
                 
-                print("Planned steps")
+                self.warehouse.log("Planned steps")
                 for step in self.planned_steps:
-                    print(f"\t{step.action} - {step.params}")
+                    self.warehouse.log(f"\t{step.action} - {step.params}")
 
             return # we have created an initial plan
+
+        # a cooperative agent that found no plan, or was held back,
+        # searches again once its wait is over
+        if self.replan_at is not None and self.warehouse.step_n >= self.replan_at:
+            self.retry_movement()
     
         # this means there are planned steps, so we need to evaluate the next one
         # and make sure it is still possible
@@ -450,24 +629,33 @@ class Agent():
             feasible, reason = self.is_move_feasible(Direction.FORWARD)
             if feasible: return
             if isinstance(reason, Agent):
-                # if an agent gets in the way wait random amount
-                n = random.choice(range(5))
-                wait_steps = [Step(AgentAction.WAIT, None) for _ in range(n)]
+                # if an agent gets in the way wait random amount,
+                # cooperative plans already wait where needed unless
+                # the agent in the way isn't where it has reserved
+                self.replans += 1
+                planner = self.warehouse.planner
+                if planner is None:
+                    wait = self.rng.choice(range(5))
+                else:
+                    with self.warehouse.lock:
+                        known = any(planner.reservations.owner(reason.position[:2], t) is reason
+                                    for t in (self.warehouse.step_n, self.warehouse.step_n + 1))
+                    wait = 0 if known else self.rng.randint(1, planner.max_backoff)
 
                 self.planned_steps = []
                 if self.state == AgentState.CARRYING_OBJECT:
-                    print("Something went wrong, recalculating path to storage")
+                    self.warehouse.log("Something went wrong, recalculating path to storage")
                     # check if path must be modified
                     if self.inventory is None:
                         raise Exception("Invalid state. Agent should have an object in the inventory if on this state")
 
                     path, storage = self.get_path_to_storage(self.inventory)
 
-                    print("Path to storage calculated:")
-                    print(path)
-                    print(storage)
+                    self.warehouse.log("Path to storage calculated:")
+                    self.warehouse.log(path)
+                    self.warehouse.log(storage)
 
-                    movement_steps = self.path_to_movement(path)
+                    movement_steps = self.plan_movement(path, wait)
                     store_steps = [
                         Step(AgentAction.STORE, { "storage": storage }),
                         Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY })
@@ -476,26 +664,28 @@ class Agent():
                     # set the plan to be the combination of these steps
                     # 1. Move to selected storage
                     # 2. Store object and set new state to standby
-                    self.planned_steps = wait_steps + movement_steps + store_steps
+                    self.planned_steps = movement_steps + store_steps
                     
-                    print("Planned steps")
+                    self.warehouse.log("Planned steps")
                     for step in self.planned_steps:
-                        print(f"\t{step.action} - {step.params}")
+                        self.warehouse.log(f"\t{step.action} - {step.params}")
                     return
 
                 if self.state == AgentState.MOVING_TO_OBJECT:
-                    print("Something went wrong, recalculating path to object")
+                    self.warehouse.log("Something went wrong, recalculating path to object")
                     try:
                         path, object = self.get_path_to_object()
                     except:
-                        # we can probably safely exit?
+                        # we can probably safely exit? stopped halfway,
+                        # so stay put where the others can see us
                         self.planned_steps = [Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY }), Step(AgentAction.WAIT, None)]
+                        self.held_back()
                         return
 
-                    print("planning to go to object", object)
-                    print("path: ", path)
+                    self.warehouse.log("planning to go to object", object)
+                    self.warehouse.log("path: ", path)
 
-                    movement_steps = self.path_to_movement(path)
+                    movement_steps = self.plan_movement(path, wait)
                     pickup_steps = [
                         Step(AgentAction.PICK_UP, { "object": object }), # pick up the object
                         Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.CARRYING_OBJECT }) # change agent state to carrying object
@@ -504,11 +694,17 @@ class Agent():
                     # set plan to be the combination of these steps
                     # 2. move to object
                     # 3. pickup object and set state to MOVING_OBJECT
-                    self.planned_steps = wait_steps + movement_steps + pickup_steps
+                    self.planned_steps = movement_steps + pickup_steps
 
-                    print("Planned steps")
+                    self.warehouse.log("Planned steps")
                     for step in self.planned_steps:
-                        print(f"\t{step.action} - {step.params}")
+                        self.warehouse.log(f"\t{step.action} - {step.params}")
+                    return
+
+                if self.state == AgentState.STANDBY:
+                    # was stepping aside, stay put for now
+                    self.planned_steps = []
+                    self.held_back()
                     return
             
             raise Exception("Unexpected error in MOVE_FORWARD:", reason)
@@ -517,6 +713,7 @@ class Agent():
             _, reason = self.is_move_feasible(Direction.FORWARD)
             if self.inventory is None and reason == next_step.params["object"]: return
             # at this point we pretty much just try another object
+            self.replans += 1
             self.planned_steps = []
             try:
                 path, object = self.get_path_to_object()
@@ -525,7 +722,7 @@ class Agent():
                 self.planned_steps = [Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY }), Step(AgentAction.WAIT, None)]
                 return
 
-            movement_steps = self.path_to_movement(path)
+            movement_steps = self.plan_movement(path)
             pickup_steps = [
                 Step(AgentAction.PICK_UP, { "object": object }), # pick up the object
                 Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.CARRYING_OBJECT }) # change agent state to carrying object
@@ -544,9 +741,10 @@ class Agent():
             _, reason = self.is_move_feasible(Direction.FORWARD, target_storage.location[2])
             if target_storage == reason and not target_storage.is_full(): return
             
+            self.replans += 1
             path, storage = self.get_path_to_storage(self.inventory)
 
-            movement_steps = self.path_to_movement(path)
+            movement_steps = self.plan_movement(path)
             store_steps = [
                 Step(AgentAction.STORE, { "storage": storage }),
                 Step(AgentAction.CHANGE_STATE, { "new_state": AgentState.STANDBY })
@@ -568,14 +766,14 @@ class Agent():
             step = self.planned_steps.pop(0)
             new_state = step.params["new_state"]
             self.state = new_state
-            print("New agent state", self.state)
+            self.warehouse.log("New agent state", self.state)
 
         if len(self.planned_steps) == 0:
             return # go to next iterations
 
         step = self.planned_steps.pop(0)
 
-        print(f"[A{self.id}] Executing step", step.action, step.params)
+        self.warehouse.log(f"[A{self.id}] Executing step", step.action, step.params)
 
         if step.action == AgentAction.MOVE_FORWARD:
             directions = {
@@ -650,6 +848,7 @@ class Agent():
                 self.warehouse.map[0][x][y + 1] = SpaceState.FREE_SPACE
                 self.map[0][x][y + 1] = SpaceState.FREE_SPACE
                 self.inventory = obj
+                picked_at = (x, y + 1, 0)
             
             if dir == Direction.RIGHT:
                 # get object reference, clear object space and store object in inventory
@@ -657,6 +856,7 @@ class Agent():
                 self.warehouse.map[0][x + 1][y] = SpaceState.FREE_SPACE
                 self.map[0][x + 1][y] = SpaceState.FREE_SPACE
                 self.inventory = obj
+                picked_at = (x + 1, y, 0)
 
             if dir == Direction.BACKWARD:
                 # get object reference, clear object space and store object in inventory
@@ -664,6 +864,7 @@ class Agent():
                 self.warehouse.map[0][x][y - 1] = SpaceState.FREE_SPACE
                 self.map[0][x][y - 1] = SpaceState.FREE_SPACE
                 self.inventory = obj
+                picked_at = (x, y - 1, 0)
 
             if dir == Direction.LEFT:
                 # get object reference, clear object space and store object in inventory
@@ -671,7 +872,9 @@ class Agent():
                 self.warehouse.map[0][x - 1][y] = SpaceState.FREE_SPACE
                 self.map[0][x - 1][y] = SpaceState.FREE_SPACE
                 self.inventory = obj
+                picked_at = (x - 1, y, 0)
 
+            self.warehouse.object_picked(picked_at)
             self.warehouse.ee.send_event("pickup", [self.id, obj.id, self.inventory.image_src.split(".")[0]] )
             return # PICK_UP handled
         
@@ -730,6 +933,7 @@ class Agent():
                 storage.store(obj)
                 self.inventory = None
 
+            self.warehouse.object_stored()
             self.warehouse.ee.send_event("store", [self.id, obj.id, storage.id])
 
             self.store_count += 1
@@ -745,7 +949,7 @@ class Agent():
             step = self.planned_steps.pop(0)
             new_state = step.params["new_state"]
             self.state = new_state
-            print("New agent state", self.state)
+            self.warehouse.log("New agent state", self.state)
         
 
     ## From here on out, all of these methods might be 
@@ -753,49 +957,170 @@ class Agent():
     
     # function that finds a path to an object
     def get_path_to_object(self) -> tuple[list[tuple[int, int, int]], Object]:
-        queue = []
-        visited = set()
-        
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # right, down, left, up
-
         initial_x, initial_y, _ = self.position
-        initial_position = (initial_x, initial_y)
 
-        queue.append(initial_position)
-        visited.add(initial_position)
-
-        floor_map = self.map[0]
-        n, m, _ = self.warehouse.dimensions
-        parents = {}
+        # free cells and objects can be walked into
+        grid = PathGrid(self.map.passable(0, Object))
+        targets = self.map.mask(Object)
+        if self.warehouse.planner is not None:
+            # leave the objects other agents are heading for to them
+            with self.warehouse.lock:
+                for cx, cy in self.warehouse.planner.reservations.claimed_by_others(self):
+                    targets[cx, cy] = False
+        path = grid.bfs_nearest((initial_x, initial_y), targets)
+
+        if path is None:
+            raise Exception("Path not found")
+
+        x, y = path[-1]
+        return [(px, py, 0) for px, py in path], self.map.get(0, x, y)
+
+    # steps to follow path up to its last cell, after waiting wait
+    # steps. cooperative agents only use the goal of the path: they
+    # search their own way in space and time around the reservations
+    # of the other agents
+    def plan_movement(self, path: list[tuple[int, int, int]], wait: int = 0) -> list[Step]:
+        if self.warehouse.planner is None:
+            return [Step(AgentAction.WAIT, None) for _ in range(wait)] + self.path_to_movement(path)
+
+        self.goal = path[-1][:2]
+        return self.cooperative_movement(wait)
+
+    # steps to self.goal over the reservations. when no plan is found
+    # the agent keeps its cell reserved and waits, plan() searches
+    # again afterwards. it never moves without a reserved plan
+    def cooperative_movement(self, wait: int = 0) -> list[Step]:
+        planner = self.warehouse.planner
+        x, y, _ = self.position
+        goal = self.goal
+        heuristic = None
+        if isinstance(self.map.get(0, *goal), Storage):
+            field = self.warehouse.fields.field(goal)
+            heuristic = lambda cx, cy: int(field[cx, cy])
+
+        grid = PathGrid(self.map.passable(0, Agent))
+        with self.warehouse.lock:
+            planner.reservations.claim(self, goal if isinstance(self.map.get(0, *goal), Object) else None)
+            timeline = planner.plan(self, grid, (x, y), self.rotation // 90, goal, self.warehouse.step_n,
+                                    heuristic, wait)
+            if timeline is None:
+                # boxed in for now, stay put where the others can
+                # see us and try again later. agents with nothing
+                # left to do may be parked around the goal or on the
+                # way to it (ignoring agents), ask them to move
+                path = grid.astar((x, y), goal) or []
+                needed = {cell for cell in path[1:] + [(goal[0] + dx, goal[1] + dy) for dx, dy in DIRECTIONS]
+                          if grid.is_walkable(cell)}
+                for cell in needed:
+                    hold = planner.reservations.holds.get(cell)
+                    if hold is not None and hold[0] is not self:
+                        hold[0].make_way |= needed
+                backoff = self.hold_position()
+                self.replan_at = self.warehouse.step_n + backoff
+                return [Step(AgentAction.WAIT, None) for _ in range(backoff)]
+
+            # under the lock, an agent parking in the way from now on
+            # sets it again
+            self.replan_at = None
+
+        return self.timeline_to_movement(timeline)
+
+    def timeline_to_movement(self, timeline: list[tuple[int, int, int]]) -> list[Step]:
+        steps: list[Step] = []
+        for (x1, y1, h1), (x2, y2, h2) in zip(timeline, timeline[1:]):
+            if (x1, y1) != (x2, y2):
+                steps.append(Step(AgentAction.MOVE_FORWARD, None))
+            elif h1 != h2:
+                steps.append(Step(AgentAction.ROTATE, { "degrees": (h2 - h1) % 4 * 90 }))
+            else:
+                steps.append(Step(AgentAction.WAIT, None))
+        return steps
 
-        def reconstruct_path(end: tuple[int, int]):
-            path: list[tuple[int, int, int]] = []
-            start = initial_position
-            current = end
-            while current != start:
-                path.append((current[0], current[1], 0))
-                current = parents[current]
+    # steps of an idle agent, asked to make way, to the closest cell
+    # away from the storages and objects, and off the cells it was
+    # asked to leave, that nobody else holds. the request stands until
+    # the agent finds a way, it tries every step
+    def step_aside(self) -> list[Step]:
+        planner = self.warehouse.planner
+        if planner is None or not self.make_way:
+            return []
+
+        walkable = self.map.passable(0, Agent)
+        busy = self.map.mask(Storage) | self.map.mask(Object)
+        near = busy.copy()
+        near[1:, :] |= busy[:-1, :]
+        near[:-1, :] |= busy[1:, :]
+        near[:, 1:] |= busy[:, :-1]
+        near[:, :-1] |= busy[:, 1:]
+        targets = walkable & ~near
 
-            path.append((start[0], start[1], 0))  # Add the start position
-            path.reverse()  # Reverse the path to go from start to end
-            return path
+        x, y, _ = self.position
+        targets[x, y] = False
+        with self.warehouse.lock:
+            for cell in self.make_way:
+                targets[cell] = False
+            for cell, (owner, _) in planner.reservations.holds.items():
+                if owner is not self:
+                    targets[cell] = False
+            path = PathGrid(walkable).bfs_nearest((x, y), targets)
+            if path is None or len(path) < 2:
+                return []
+
+            timeline = planner.plan(self, PathGrid(walkable), (x, y), self.rotation // 90, path[-1],
+                                    self.warehouse.step_n, face_goal=False)
+            if timeline is None:
+                # boxed in by agents, pass the request on to them
+                self.hold_position()
+                for dx, dy in DIRECTIONS:
+                    hold = planner.reservations.holds.get((x + dx, y + dy))
+                    if hold is not None and hold[0] is not self:
+                        hold[0].make_way |= self.make_way
+                return []
+
+            self.make_way = set()
+        return self.timeline_to_movement(timeline)
+
+    # replace the movement at the head of the plan by a new search
+    # to self.goal, keeping what the agent does once there
+    def retry_movement(self):
+        movement = (AgentAction.MOVE_FORWARD, AgentAction.ROTATE, AgentAction.WAIT)
+        changes: list[Step] = []
+        i = 0
+        while i < len(self.planned_steps) and self.planned_steps[i].action in movement + (AgentAction.CHANGE_STATE,):
+            if self.planned_steps[i].action == AgentAction.CHANGE_STATE:
+                changes.append(self.planned_steps[i])
+            i += 1
+
+        if i == len(self.planned_steps):
+            # nothing left to do at the goal, drop the unreserved
+            # moves and let plan() start over
+            self.replan_at = None
+            self.planned_steps = changes
+            return
 
-        while queue:
-            x, y = queue.pop(0)
+        self.planned_steps = changes + self.cooperative_movement() + self.planned_steps[i:]
 
-            if isinstance(floor_map[x][y], Object):
-                path = reconstruct_path((x, y))
-                return path, floor_map[x][y]
+    # the agent stays where it is this step, behind its reservations
+    # (its next action lost a conflict while committing, or it gave up
+    # halfway). hold the cell it is really on and search again next step
+    def held_back(self):
+        planner = self.warehouse.planner
+        if planner is None:
+            return
 
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < n and 0 <= ny < m and (nx, ny) not in visited:
-                    if floor_map[nx][ny] == SpaceState.FREE_SPACE or isinstance(floor_map[nx][ny], Object):
-                        queue.append((nx, ny))
-                        visited.add((nx, ny))
-                        parents[(nx, ny)] = (x, y)
+        with self.warehouse.lock:
+            self.hold_position()
+        self.replan_at = self.warehouse.step_n + 1
 
-        raise Exception("Path not found")
+    # keep the cell this agent stands on reserved and nothing else,
+    # with the warehouse lock held. agents that had planned through
+    # the cell search again. returns the steps to wait before this
+    # agent plans again
+    def hold_position(self) -> int:
+        backoff, displaced = self.warehouse.planner.fallback(self, self.position[:2], self.warehouse.step_n, self.rng)
+        for agent in displaced:
+            agent.replan_at = self.warehouse.step_n
+        return backoff
 
     def path_to_movement(self, path: list[tuple[int, int, int]]) -> list[Step]:
         current_rotation = self.rotation
@@ -845,146 +1170,87 @@ class Agent():
         return steps
 
     def scan_object(self, object: Object) -> str:
-        object_srcs = os.listdir("server/objects")
-        object_names = [s.split(".")[0] for s in object_srcs]
-
-        load_dotenv()
-
-        def encode_image(image_path):
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
-
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        image_path = os.path.join("server", "objects", object.image_src)
-        base64_image = encode_image(image_path)
-
-        completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a simple vision model. Your task is to see the image provided by the user and reply with the closest label on this list: {", ".join(object_names)}"
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            model="gpt-4o-mini",
-            max_completion_tokens=25,
-            temperature=0.1,
-        )
-
-        maybe_response = completion.choices[0].message.content
-
-        if maybe_response is None:
-            raise Exception("Model response was empty")
-
-
-
-        self.warehouse.ee.send_event("vision", [self.id, maybe_response])
-
-        return maybe_response 
+        label = self.warehouse.scanner.scan(object.image_src)
+        self.warehouse.ee.send_event("vision", [self.id, label])
+        return label
 
     def get_object_storage_location(self, external_key: str) -> Storage:
-        object_srcs = os.listdir("server/objects")
-        objects = len(object_srcs)
-        spots = len(self.warehouse.storages)
-        extras = spots % objects
-        equals = (spots - extras) // objects
-
-        counts = [0] * objects
-        for i in range(objects):
-            n = equals
-            if extras != 0:
-                extras -= 1
-                n += 1
-            counts[i] = n
-
-        storage_map = {}
-        start = 0
-        for i, count in enumerate(counts):
-            key = object_srcs[i].split(".")[0]
-            storages = [self.warehouse.storages[j] for j in range(start, start + count)]
-            start += count
-            storage_map[key] = storages
-            print("STORAGES: ", key)
-            for s in storages:
-                print("\t", s.location, s)
-
-
-        suitable_storages = storage_map[external_key]
-        for storage in suitable_storages:
-            if not storage.is_full():
-                return storage
-            
-        raise Exception("No space left")
+        return self.warehouse.storage_for(external_key)
 
     # function that finds a path to the place to store that object
     def get_path_to_storage(self, object: Object) -> tuple[list[tuple[int, int, int]], Storage]:
         key = self.scan_object(object)
         storage = self.get_object_storage_location(key)
-        path_to_storage = self.calculate_path((storage.location[0], storage.location[1], 0))
+
+        # read the path off the storage distance field. agents don't
+        # count as obstacles there, so if this agent believes anything
+        # is in the way (e.g. it is replanning around another agent)
+        # fall back to searching its own map. when other agents wall it
+        # in completely, keep the field path and wait for them to move
+        path = self.warehouse.fields.path(self.position[:2], storage.location[:2])
+        if path is None or any(self.map.get(0, px, py) != SpaceState.FREE_SPACE for px, py in path[1:-1]):
+            try:
+                return self.calculate_path((storage.location[0], storage.location[1], 0)), storage
+            except Exception:
+                if path is None:
+                    raise
+
+        path_to_storage = [(px, py, 0) for px, py in path]
         return path_to_storage, storage
 
     def calculate_path(self, target: tuple[int, int, int]) -> list[tuple[int, int, int]]:
-        queue = []
-        visited = set()
+        initial_x, initial_y, _ = self.position
 
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)] # right, down, left, up
+        # the target itself is usually a storage, it is reached by
+        # standing next to it. PathGrid.jps is faster on open floors
+        # once its tables are built, A* needs no setup
+        grid = PathGrid(self.map.passable(0))
+        path = grid.astar((initial_x, initial_y), (target[0], target[1]))
+
+        if path is None:
+            raise Exception("Path not found")
+
+        return [(px, py, 0) for px, py in path]
+
+    # claim what the next action needs in the reservation table,
+    # checked against the live warehouse map. False if another agent
+    # got there first this step, the action is then left planned
+    def reserve(self, reservations: dict[tuple[int, int], 'Agent']) -> bool:
+        step = next((s for s in self.planned_steps if s.action != AgentAction.CHANGE_STATE), None)
+        if step is None or step.action not in (AgentAction.MOVE_FORWARD, AgentAction.PICK_UP, AgentAction.STORE):
+            return True
+
+        directions = {
+            0: (0, 1),
+            90: (1, 0),
+            180: (0, -1),
+            270: (-1, 0),
+        }
+        dx, dy = directions[self.rotation]
+        x, y, _ = self.position
+        cell = (x + dx, y + dy)
+        if cell in reservations:
+            return False
 
-        initial_x, initial_y, _ = self.position
-        initial_position = (initial_x, initial_y)
-
-        queue.append(initial_position)
-        visited.add(initial_position)
-
-        floor_map = self.map[0]
-        n, m, _ = self.warehouse.dimensions
-        parents = {}
-
-        def reconstruct_path(end: tuple[int, int]):
-            path: list[tuple[int, int, int]] = []
-            start = initial_position
-            current = end
-            while current != start:
-                path.append((current[0], current[1], 0))
-                current = parents[current]
-
-            path.append((start[0], start[1], 0))  # Add the start position
-            path.reverse()  # Reverse the path to go from start to end
-            return path
-        
-        while queue:
-            x, y = queue.pop(0)
+        if step.action == AgentAction.MOVE_FORWARD:
+            if self.warehouse.map.get(0, *cell) != SpaceState.FREE_SPACE:
+                return False
 
-            if (x, y, 0) == target:
-                path = reconstruct_path((x, y))
-                return path
+        if step.action == AgentAction.PICK_UP:
+            if self.warehouse.map.get(0, *cell) is not step.params["object"]:
+                return False
 
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < n and 0 <= ny < m and (nx, ny) not in visited:
-                    if floor_map[nx][ny] == SpaceState.FREE_SPACE or (nx, ny, 0) == target:
-                        queue.append((nx, ny))
-                        visited.add((nx, ny))
-                        parents[(nx, ny)] = (x, y)
+        if step.action == AgentAction.STORE:
+            # several agents can store side by side, only room matters
+            return not step.params["storage"].is_full()
 
-        raise Exception("Path not found")
+        reservations[cell] = self
+        return True
 
     def is_move_feasible(self, move: Direction, z = 0):
         x, y, _ = self.position
         x_space, y_space, _ = self.warehouse.dimensions
 
-        map = self.map[z]
-
         dir_to_angle = {
             Direction.FORWARD: 0,
             Direction.RIGHT: 90,
@@ -1008,6 +1274,7 @@ class Agent():
         new_x, new_y = x + dx, y + dy
 
         if new_x >= 0 and new_x < x_space and new_y >= 0 and new_y < y_space:
-            return map[new_x][new_y] == SpaceState.FREE_SPACE, map[new_x][new_y]
+            cell = self.map.get(z, new_x, new_y)
+            return cell == SpaceState.FREE_SPACE, cell
 
         return False, SpaceState.OUT_OF_BOUNDS    
\ No newline at end of file
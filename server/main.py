@@ -5,7 +5,6 @@ from time import sleep
 from uuid import uuid4
 import base64
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
 import datetime
 from typing import Any
@@ -21,8 +20,15 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI client, created on the first analysis
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
 
 class Position():
     def __init__(self, x: int, y: int, z: int):
@@ -70,7 +76,7 @@ class DroneOperationMode(Enum):
     AUTONOMOUS = "AUTONOMOUS"
     CONTROLLED = "CONTROLLED"
 
-serverconn = EventEmitter()
+serverconn = EventEmitter()  # connected in __main__
 
 class Agent():
     """
@@ -311,7 +317,7 @@ class DroneAgent(Agent):
         
         try:
             # Create the message for GPT-4-Vision
-            response = client.chat.completions.create(
+            response = get_client().chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -532,8 +538,11 @@ class Simulation():
             
             sleep(self.dt)
 
-drone = DroneAgent(Position(0, 0, 0), None)
-guard = GuardAgent(Position(1, 1, 1), drone)
+if __name__ == "__main__":
+    serverconn.start()
+
+    drone = DroneAgent(Position(0, 0, 0), None)
+    guard = GuardAgent(Position(1, 1, 1), drone)
 
-sim = Simulation(guard, drone)
-sim.run()
+    sim = Simulation(guard, drone)
+    sim.run()
@@ -0,0 +1,83 @@
+import base64
+import threading
+
+# camera_id, x, y, z, xrot, yrot, zrot come before the image
+HEADER_FIELDS = 7
+
+
+class CameraFrame():
+    """
+    A decoded `camera_capture`/`drone_camera_capture` event. The header
+    is parsed into numbers up front, the base64 image stays inside the
+    original event string until somebody actually asks for it. Frames
+    are shared with the decoder threads, so the one-off encode of the
+    string is done under a lock.
+    """
+    __slots__ = ("camera_id", "pose", "_raw", "_offset", "_encoded", "_lock")
+
+    def __init__(self, camera_id: str, pose: tuple[float, ...], raw: str, offset: int):
+        self.camera_id = camera_id
+        self.pose = pose
+        self._raw = raw
+        self._offset = offset
+        self._encoded = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Size of the base64 payload"""
+        with self._lock:
+            payload = self._encoded if self._encoded is not None else self._raw
+
+        return len(payload) - self._offset
+
+    @property
+    def buffer(self) -> memoryview:
+        """
+        View over the ASCII bytes of the base64 payload. The event string
+        is encoded (copied) once on first use and dropped, later calls
+        share the same bytes.
+        """
+        with self._lock:
+            if self._encoded is None:
+                self._encoded = self._raw.encode("ascii")
+                self._raw = None
+            encoded = self._encoded
+
+        return memoryview(encoded)[self._offset:]
+
+    @property
+    def b64(self) -> str:
+        """The base64 payload as a string, a copy once the bytes exist"""
+        with self._lock:
+            raw = self._raw
+        if raw is not None:
+            return raw[self._offset:]
+
+        return str(self.buffer, "ascii")
+
+    @property
+    def data(self) -> bytes:
+        """The decoded image bytes"""
+        return base64.b64decode(self.buffer)
+
+
+def decode_capture(event: str) -> CameraFrame:
+    """
+    Decode a capture event of the form "camera_id,x,y,z,xrot,yrot,zrot,b64img".
+    Only the header fields are sliced out of the event, the image is left
+    in place.
+    """
+    fields = []
+    start = 0
+    for _ in range(HEADER_FIELDS):
+        end = event.find(",", start)
+        if end == -1:
+            raise ValueError(f"Malformed capture event, expected {HEADER_FIELDS} header fields")
+
+        fields.append(event[start:end])
+        start = end + 1
+
+    camera_id = fields[0]
+    pose = tuple(float(v) for v in fields[1:])
+
+    return CameraFrame(camera_id, pose, event, start)
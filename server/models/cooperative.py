@@ -0,0 +1,233 @@
+from typing import Any, Callable
+import heapq
+import random
+
+from .pathfinding import DIRECTIONS, PathGrid
+
+
+class ReservationTable():
+    """
+    Space-time reservations of the floor cells: which agent stands on
+    (x, y) at tick t. Agents that finished their path keep holding the
+    cell they stopped on from that tick on, until they plan again.
+    Goals can be claimed too, so two agents don't head for the same one.
+    """
+    def __init__(self):
+        self.cells: dict[tuple[int, int], dict[int, Any]] = {}
+        self.holds: dict[tuple[int, int], tuple[Any, int]] = {}
+        self.claims: dict[tuple[int, int], Any] = {}
+        self._claimed: dict[Any, tuple[int, int]] = {}
+        self._owned: dict[Any, list[tuple[tuple[int, int], int]]] = {}
+        self._held: dict[Any, tuple[int, int]] = {}
+
+    def owner(self, cell: tuple[int, int], t: int) -> Any:
+        slots = self.cells.get(cell)
+        owner = slots.get(t) if slots is not None else None
+        if owner is None:
+            hold = self.holds.get(cell)
+            if hold is not None and t >= hold[1]:
+                return hold[0]
+        return owner
+
+    def is_free(self, cell: tuple[int, int], t: int, agent: Any) -> bool:
+        owner = self.owner(cell, t)
+        return owner is None or owner is agent
+
+    def is_free_after(self, cell: tuple[int, int], t: int, agent: Any) -> bool:
+        """Nobody else needs cell from tick t on, so agent can stop there"""
+        hold = self.holds.get(cell)
+        if hold is not None and hold[0] is not agent:
+            return False
+        slots = self.cells.get(cell)
+        return slots is None or all(owner is agent or at < t for at, owner in slots.items())
+
+    def reserve(self, agent: Any, cells: list[tuple[int, int]], t0: int):
+        """agent stands on cells[i] at tick t0 + i, and on the last one after that"""
+        self.release(agent)
+        owned = self._owned.setdefault(agent, [])
+        for i, cell in enumerate(cells):
+            self.cells.setdefault(cell, {})[t0 + i] = agent
+            owned.append((cell, t0 + i))
+        self.hold(agent, cells[-1], t0 + len(cells) - 1)
+
+    def hold(self, agent: Any, cell: tuple[int, int], t: int) -> list[Any]:
+        """
+        agent keeps cell from tick t on. Returns the other agents that
+        had cell reserved from t on, their plans don't hold anymore.
+        """
+        previous = self._held.pop(agent, None)
+        if previous is not None and self.holds.get(previous, (None,))[0] is agent:
+            del self.holds[previous]
+
+        others = {owner for at, owner in self.cells.get(cell, {}).items() if at >= t and owner is not agent}
+        current = self.holds.get(cell)
+        if current is not None and current[0] is not agent:
+            others.add(current[0])
+            del self._held[current[0]]
+
+        self.holds[cell] = (agent, t)
+        self._held[agent] = cell
+        return list(others)
+
+    def claim(self, agent: Any, goal: tuple[int, int] | None):
+        """agent is heading for goal, None drops its claim"""
+        previous = self._claimed.pop(agent, None)
+        if previous is not None and self.claims.get(previous) is agent:
+            del self.claims[previous]
+        if goal is not None:
+            self.claims[goal] = agent
+            self._claimed[agent] = goal
+
+    def claimed_by_others(self, agent: Any) -> list[tuple[int, int]]:
+        return [goal for goal, owner in self.claims.items() if owner is not agent]
+
+    def release(self, agent: Any):
+        for cell, t in self._owned.pop(agent, []):
+            slots = self.cells.get(cell)
+            if slots is not None and slots.get(t) is agent:
+                del slots[t]
+                if not slots:
+                    del self.cells[cell]
+
+        cell = self._held.pop(agent, None)
+        if cell is not None and self.holds.get(cell, (None,))[0] is agent:
+            del self.holds[cell]
+
+
+class CooperativePlanner():
+    """
+    Prioritised planning over a reservation table: each agent runs a
+    space-time A* that avoids the cells (and head-on swaps) reserved by
+    the agents that planned before it, then reserves its own path. The
+    search works on (x, y, heading, t) states, like the agents move:
+    a tick to wait, a tick to rotate, a tick to step forward. Plans end
+    next to the goal, facing it, where the agent then keeps its cell.
+
+    Every agent must always be in the table where it really stands, an
+    agent without a plan holds its cell (see fallback) and moves again
+    only once it has a plan.
+    """
+    def __init__(self, reservations: ReservationTable | None = None, max_expansions: int = 2000,
+                 max_backoff: int = 4):
+        self.reservations = reservations or ReservationTable()
+        self.max_expansions = max_expansions
+        self.max_backoff = max_backoff
+        self.plans = 0
+        self.failures = 0
+
+    def fallback(self, agent: Any, cell: tuple[int, int], t: int, rng: random.Random) -> tuple[int, list[Any]]:
+        """
+        agent found no plan or was held back: it keeps cell from tick t
+        on, with nothing else reserved. Returns how many ticks it should
+        wait before planning again, at least one, and the agents that
+        had planned through cell and must plan again.
+        """
+        self.reservations.release(agent)
+        displaced = self.reservations.hold(agent, cell, t)
+        return rng.randint(1, self.max_backoff), displaced
+
+    def plan(self, agent: Any, walkable: PathGrid, start: tuple[int, int], heading: int, goal: tuple[int, int],
+             t0: int, heuristic: Callable[[int, int], int] | None = None,
+             delay: int = 0, face_goal: bool = True) -> list[tuple[int, int, int]] | None:
+        """
+        (x, y, heading) of agent at every tick from t0, heading being an
+        index into DIRECTIONS. The agent waits in start for the first
+        delay ticks. Without face_goal the plan ends on goal instead of
+        next to it. None if no plan was found within max_expansions,
+        nothing is reserved then.
+        """
+        table = self.reservations
+        gx, gy = goal
+        if heuristic is None:
+            heuristic = lambda x, y: abs(x - gx) + abs(y - gy)
+
+        def reached(x: int, y: int, h: int, t: int) -> bool:
+            if not face_goal:
+                return (x, y) == goal and table.is_free_after((x, y), t, agent)
+            dx, dy = DIRECTIONS[h]
+            # the action on the goal takes one more tick in the cell
+            return (x + dx, y + dy) == goal and table.is_free_after((x, y), t, agent)
+
+        # agents parked next to the goal don't move until they plan
+        # again, if they are all around it there is no point searching
+        if face_goal and all(not walkable.is_walkable((gx + dx, gy + dy)) or table.holds.get((gx + dx, gy + dy), (agent,))[0] is not agent
+               for dx, dy in DIRECTIONS):
+            self.plans += 1
+            self.failures += 1
+            return None
+
+        # nor if somebody needs start while the agent waits there
+        if not all(table.is_free(start, t, agent) for t in range(t0 + 1, t0 + delay + 1)):
+            self.plans += 1
+            self.failures += 1
+            return None
+
+        cells, height = walkable.cells, walkable.height
+        width = walkable.width
+
+        def estimate(x: int, y: int, h: int) -> int:
+            distance = heuristic(x, y)
+            if distance < 0:
+                return -1
+            # a goal that isn't straight ahead takes at least one turn
+            dx, dy = DIRECTIONS[h]
+            ahead = (gx - x) * dx + (gy - y) * dy
+            turn = 0 if ahead > 0 and (gx - x) * dy - (gy - y) * dx == 0 else 1
+            return max(distance - 1, 0) + turn
+
+        def free_cell(x: int, y: int) -> bool:
+            return 0 <= x < width and 0 <= y < height and bool(cells[x * height + y])
+
+        start_state = (start[0], start[1], heading, t0 + delay)
+        parents: dict[tuple[int, int, int, int], tuple[int, int, int, int]] = {}
+        closed = set()
+        frontier = [(max(estimate(*start_state[:3]), 0), 0, start_state)]
+        expansions = 0
+        self.plans += 1
+
+        while frontier and expansions < self.max_expansions:
+            _, neg_g, state = heapq.heappop(frontier)
+            if state in closed:
+                continue
+            closed.add(state)
+            expansions += 1
+
+            x, y, h, t = state
+            if reached(x, y, h, t):
+                timeline = [state[:3]]
+                while state in parents:
+                    state = parents[state]
+                    timeline.append(state[:3])
+                timeline.extend([timeline[-1]] * delay)
+                timeline.reverse()
+                table.reserve(agent, [(cx, cy) for cx, cy, _ in timeline], t0)
+                return timeline
+
+            successors = []
+            if table.is_free((x, y), t + 1, agent):
+                # wait, or turn to face a cell that can be walked
+                # into or the goal, turning to a wall is pointless
+                successors.append((x, y, h, t + 1))
+                for nh, (dx, dy) in enumerate(DIRECTIONS):
+                    if nh != h and ((x + dx, y + dy) == goal or free_cell(x + dx, y + dy)):
+                        successors.append((x, y, nh, t + 1))
+
+            dx, dy = DIRECTIONS[h]
+            nx, ny = x + dx, y + dy
+            if free_cell(nx, ny) and table.is_free((nx, ny), t + 1, agent):
+                # no swapping places with an agent coming the other way
+                other = table.owner((nx, ny), t)
+                if other is None or other is agent or table.owner((x, y), t + 1) is not other:
+                    successors.append((nx, ny, h, t + 1))
+
+            for nxt in successors:
+                if nxt in closed:
+                    continue
+                remaining = estimate(nxt[0], nxt[1], nxt[2])
+                if remaining < 0:
+                    continue
+                parents[nxt] = state
+                heapq.heappush(frontier, (t + 1 - t0 + remaining, neg_g - 1, nxt))
+
+        self.failures += 1
+        return None
@@ -1,17 +1,39 @@
-from typing import Callable, Any
+from typing import TYPE_CHECKING, Callable, Any
+from collections import deque
 import socket
 import json
 import threading
-from queue import Queue
+import time
+from queue import Empty, Queue
+
+if TYPE_CHECKING:
+    from .metrics import Metrics
+
+def put_bounded(emitter: 'MockEmitter | EventEmitter', type: str, data: str):
+    """Queue an event, dropping the oldest one of its type if the queue is full"""
+    queue = emitter.event_queues[type]
+    if queue.full():
+        try:
+            queue.get_nowait()
+            emitter.event_drops[type] = emitter.event_drops.get(type, 0) + 1
+        except Empty:
+            pass    # drained by the consumer in the meantime
+
+    queue.put(data)
+    emitter.event_counts[type] = emitter.event_counts.get(type, 0) + 1
+
 
 class MockEmitter():
-    def __init__(self):
+    def __init__(self, queue_limits: dict[str, int] | None = None):
         self.event_queues: dict[str, Queue] = {}
+        self.event_counts: dict[str, int] = {}
+        self.event_drops: dict[str, int] = {}
+        self.queue_limits = queue_limits or {}  # event type -> max queued events, oldest dropped first
 
     def register_event_type(self, type: str):
         """Register a new event type with its own queue"""
         if type not in self.event_queues:
-            self.event_queues[type] = Queue()
+            self.event_queues[type] = Queue(maxsize=self.queue_limits.get(type, 0))
 
     def get_event(self, type: str) -> str:
         """Get the next event of the specified type from its queue"""
@@ -37,18 +59,68 @@ class MockEmitter():
         if type not in self.event_queues:
             self.register_event_type(type)
             
-        self.event_queues[type].put(",".join(data))
+        put_bounded(self, type, ",".join(data))
+
+    def start(self):
+        pass
+
+    def flush(self, timeout: float | None = None) -> bool:
+        return True
 
     def close(self):
         pass
 
 class EventEmitter():
-    def __init__(self, port=65432, host="localhost"):
+    """
+    TCP server the Unity simulation connects to. Nothing is opened
+    until start(), which blocks until the simulation connects, so the
+    emitter can be built (and the agents wired) without a client.
+
+    Outgoing events go through a bounded outbox drained by a single
+    writer thread, so agents never block on a slow reader and bytes
+    of concurrent sends never interleave. Queued events of a type in
+    coalesce with the same key are replaced by the newest one, and the
+    writer packs everything queued into as few sendall calls as it can.
+    """
+    def __init__(self, port=65432, host="localhost", queue_limits: dict[str, int] | None = None,
+                 send_limit: int = 1024, send_timeout: float = 1.0, batch_bytes: int = 65536,
+                 coalesce: dict[str, Callable[[list[str]], str]] | None = None, metrics: 'Metrics | None' = None):
         self.event_queues: dict[str, Queue] = {}
-        self.running = True
+        self.event_counts: dict[str, int] = {}
+        self.event_drops: dict[str, int] = {}
+        self.queue_limits = queue_limits or {}  # event type -> max queued events, oldest dropped first
+        self.port = port
+        self.host = host
+        self.running = False
+        self.sock: socket.socket | None = None
+        self.conn: socket.socket | None = None
+        self.addr = None
+
+        self.send_limit = send_limit        # max events waiting in the outbox
+        self.send_timeout = send_timeout    # how long send_event waits for room before dropping
+        self.batch_bytes = batch_bytes      # stop adding events to a batch past this size
+        self.coalesce = coalesce or {}      # event type -> key of the events that supersede each other
+        self.metrics = metrics
+        # entries are [type, key, message bytes, enqueued at]
+        self.outbox: deque[list] = deque()
+        self.pending: dict[tuple[str, str], list] = {}
+        self.outbox_lock = threading.Condition()
+        self.sent = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.send_drops = 0
+        self.writing = False                # a batch is being written
+        self.writer_thread: threading.Thread | None = None
+        self.write_error: OSError | None = None     # why the writer thread stopped, if it failed
+
+    def start(self):
+        """Listen on the port and wait for the simulation to connect"""
+        if self.running:
+            return
+
         # Configura el socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.bind((host, port))
+        self.sock.bind((self.host, self.port))
         self.sock.listen()
 
         print("Esperando conexión...")
@@ -56,15 +128,28 @@ class EventEmitter():
 
         if self.conn:
             print('Conectado por', self.addr)
+            self.running = True
             # Start event handling thread
             self.event_thread = threading.Thread(target=self.handle_events)
             self.event_thread.daemon = True
             self.event_thread.start()
 
+            # events sent before the connection are in the outbox already
+            self.writer_thread = threading.Thread(target=self.write_events)
+            self.writer_thread.daemon = True
+            self.writer_thread.start()
+
+    def __enter__(self) -> 'EventEmitter':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def register_event_type(self, type: str):
         """Register a new event type with its own queue"""
         if type not in self.event_queues:
-            self.event_queues[type] = Queue()
+            self.event_queues[type] = Queue(maxsize=self.queue_limits.get(type, 0))
 
     def get_event(self, type: str) -> str:
         """Get the next event of the specified type from its queue"""
@@ -80,9 +165,12 @@ class EventEmitter():
         
         return not self.event_queues[type].empty()
 
-    def send_event(self, type: str, data: list[str]):
+    def send_event(self, type: str, data: list[str]) -> bool:
         """
-        Send an event through current TCP connection.
+        Queue an event to be sent through current TCP connection.
+        Returns False if the outbox stayed full for send_timeout
+        seconds and the event was dropped, or right away once the
+        connection failed and nothing is written anymore.
         Args:
             type: Event type identifier
             data: List of strings to be joined with commas
@@ -92,8 +180,92 @@ class EventEmitter():
             "data": ",".join(data)
         }
 
-        message = json.dumps(event) + "\n"
-        self.conn.sendall(message.encode('utf-8'))
+        message = (json.dumps(event) + "\n").encode('utf-8')
+        key = self.coalesce[type](data) if type in self.coalesce else None
+
+        with self.outbox_lock:
+            if self.write_error is not None:
+                self.send_drops += 1
+                return False
+
+            entry = self.pending.get((type, key)) if key is not None else None
+            if entry is not None:
+                # still waiting to be written, send the newest data in its place
+                entry[2] = message
+                self.coalesced += 1
+                return True
+
+            room = lambda: len(self.outbox) < self.send_limit or self.write_error is not None
+            if not self.outbox_lock.wait_for(room, self.send_timeout):
+                self.send_drops += 1
+                print(f"[WARN] EventEmitter.send_event() - Outbox full, dropping {type} event")
+                return False
+            if self.write_error is not None:
+                self.send_drops += 1
+                return False
+
+            entry = [type, key, message, time.perf_counter()]
+            self.outbox.append(entry)
+            if key is not None:
+                self.pending[(type, key)] = entry
+            self.outbox_lock.notify_all()
+
+        return True
+
+    def write_events(self):
+        """Writer thread, the only one calling sendall"""
+        while True:
+            with self.outbox_lock:
+                self.outbox_lock.wait_for(lambda: self.outbox or not self.running)
+                if not self.outbox:
+                    return
+
+                batch, size = [], 0
+                while self.outbox and (not batch or size + len(self.outbox[0][2]) <= self.batch_bytes):
+                    entry = self.outbox.popleft()
+                    if entry[1] is not None:
+                        del self.pending[(entry[0], entry[1])]
+                    batch.append(entry)
+                    size += len(entry[2])
+                self.writing = True
+                self.outbox_lock.notify_all()
+
+            try:
+                self.conn.sendall(b"".join(entry[2] for entry in batch))
+            except OSError as e:
+                if self.running:
+                    print(f"Error sending events, no more events will be sent: {e}")
+                # wakes up the senders waiting for room, they drop from now on
+                with self.outbox_lock:
+                    self.write_error = e
+                    self.send_drops += len(self.outbox) + len(batch)
+                    self.outbox.clear()
+                    self.pending.clear()
+                return
+            finally:
+                with self.outbox_lock:
+                    self.writing = False
+                    self.outbox_lock.notify_all()
+
+            now = time.perf_counter()
+            self.sent += len(batch)
+            self.batches += 1
+            if self.metrics is not None:
+                for entry in batch:
+                    self.metrics.observe("send_latency_seconds", now - entry[3], type=entry[0])
+                self.metrics.observe("send_batch_size", len(batch), buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+    def outbox_depth(self) -> int:
+        return len(self.outbox)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued event has been handed to the socket"""
+        if self.writer_thread is None:
+            return not self.outbox
+
+        with self.outbox_lock:
+            idle = lambda: not (self.outbox or self.writing)
+            return self.outbox_lock.wait_for(lambda: idle() or not self.writer_thread.is_alive(), timeout) and idle()
 
     def handle_events(self):
         """Listen for and handle incoming events."""
@@ -121,7 +293,7 @@ class EventEmitter():
                         if event_type not in self.event_queues:
                             self.register_event_type(event_type)
                         
-                        self.event_queues[event_type].put(event_data)
+                        put_bounded(self, event_type, event_data)
                     except json.JSONDecodeError:
                         print(f"Invalid JSON received")
             except Exception as e:
@@ -130,6 +302,11 @@ class EventEmitter():
 
 
     def close(self):
-        self.running = False
-        self.sock.close()
-        self.conn.close()
\ No newline at end of file
+        self.flush(self.send_timeout)
+        with self.outbox_lock:
+            self.running = False
+            self.outbox_lock.notify_all()
+        if self.conn is not None:
+            self.conn.close()
+        if self.sock is not None:
+            self.sock.close()
\ No newline at end of file
@@ -0,0 +1,39 @@
+class MoveTimeModel():
+    """
+    Predicts how long a drone takes to reach a camera, as a linear
+    function of the distance, fitted by least squares on the observed
+    BUSY -> IDLE intervals. A few pseudo observations built from the
+    DroneManager speed keep predictions sane before real data arrives.
+    """
+    def __init__(self, speed: float = 10.0, overhead: float = 0.0, prior_weight: float = 4.0, prior_distance: float = 50.0):
+        self.samples = 0
+        self.n = 0.0
+        self.sx = 0.0
+        self.sy = 0.0
+        self.sxx = 0.0
+        self.sxy = 0.0
+
+        for distance in (0.0, prior_distance):
+            self._add(distance, overhead + distance / speed, prior_weight / 2)
+
+    def _add(self, distance: float, duration: float, weight: float):
+        self.n += weight
+        self.sx += weight * distance
+        self.sy += weight * duration
+        self.sxx += weight * distance * distance
+        self.sxy += weight * distance * duration
+
+    def observe(self, distance: float, duration: float):
+        self.samples += 1
+        self._add(distance, duration, 1.0)
+
+    def coefficients(self) -> tuple[float, float]:
+        """(seconds of overhead, seconds per unit of distance)"""
+        denominator = self.n * self.sxx - self.sx * self.sx
+        slope = (self.n * self.sxy - self.sx * self.sy) / denominator
+        intercept = (self.sy - slope * self.sx) / self.n
+        return intercept, slope
+
+    def predict(self, distance: float) -> float:
+        intercept, slope = self.coefficients()
+        return max(0.0, intercept + slope * distance)
@@ -0,0 +1,109 @@
+from collections import deque
+import threading
+import numpy as np
+
+from .grid import OccupancyGrid
+from .pathfinding import DIRECTIONS, PathGrid
+
+
+class DistanceFields():
+    """
+    BFS distance from every floor cell to each goal (the storages),
+    so a path to a goal is read off by walking downhill in O(path
+    length) instead of searching. Fields are built the first time a
+    goal is asked for (or all at once with precompute). Cells that open
+    up are patched in place, anything that adds an obstacle drops the
+    fields so they are rebuilt on demand.
+
+    Cells holding one of passable_kinds count as walkable, meant for
+    agents: they move every step, and are dealt with by the caller.
+    """
+    def __init__(self, grid: OccupancyGrid, *passable_kinds: type):
+        self.grid = grid
+        self.passable_kinds = passable_kinds
+        self.fields: dict[tuple[int, int], np.ndarray] = {}
+        self._paths: PathGrid | None = None     # walkable cells, kept up to date by opened()
+        self.builds = 0
+        self._lock = threading.Lock()   # agents may plan on several threads
+        self.patches = 0
+
+    def paths(self) -> PathGrid:
+        if self._paths is None:
+            self._paths = PathGrid(self.grid.passable(0, *self.passable_kinds))
+        return self._paths
+
+    def invalidate(self):
+        """An obstacle was added, every field has to be rebuilt"""
+        self.fields.clear()
+        self._paths = None
+
+    def field(self, goal: tuple[int, int]) -> np.ndarray:
+        """Distances to goal as a (x, y) int32 array, -1 where unreachable"""
+        goal = (goal[0], goal[1])
+        with self._lock:
+            field = self.fields.get(goal)
+            if field is None:
+                paths = self.paths()
+                field = np.array(paths.distances([goal]), dtype=np.int32).reshape(paths.width, paths.height)
+                self.fields[goal] = field
+                self.builds += 1
+            return field
+
+    def precompute(self, goals: list[tuple[int, int]]):
+        for goal in goals:
+            self.field(goal)
+
+    def opened(self, x: int, y: int):
+        """A cell became walkable (e.g. an object was picked up)"""
+        if self._paths is None:
+            return
+
+        width, height = self._paths.width, self._paths.height
+        walkable = self._paths.cells
+        walkable[x * height + y] = 1
+
+        for field in self.fields.values():
+            best = -1
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height and field[nx, ny] >= 0:
+                    if best < 0 or field[nx, ny] + 1 < best:
+                        best = int(field[nx, ny]) + 1
+            if best < 0 or (0 <= field[x, y] <= best):
+                continue
+
+            # distances can only shrink, spread the shortcut outwards
+            field[x, y] = best
+            frontier = deque([(x, y)])
+            while frontier:
+                cx, cy = frontier.popleft()
+                step = field[cx, cy] + 1
+                for dx, dy in DIRECTIONS:
+                    nx, ny = cx + dx, cy + dy
+                    if 0 <= nx < width and 0 <= ny < height and walkable[nx * height + ny]:
+                        if field[nx, ny] < 0 or field[nx, ny] > step:
+                            field[nx, ny] = step
+                            frontier.append((nx, ny))
+            self.patches += 1
+
+    def path(self, start: tuple[int, int], goal: tuple[int, int]) -> list[tuple[int, int]] | None:
+        """Shortest path from start to goal (both included), None if unreachable"""
+        field = self.field(goal)
+        _, width, height = self.grid.shape
+        x, y = start
+        distance = field[x, y]
+        if distance < 0:
+            return None
+
+        path = [(x, y)]
+        while distance > 0:
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height and field[nx, ny] == distance - 1:
+                    x, y, distance = nx, ny, distance - 1
+                    break
+            else:
+                return None     # only if the field was patched wrong
+            path.append((x, y))
+
+        return path
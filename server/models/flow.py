@@ -0,0 +1,105 @@
+from typing import Callable
+import time
+
+
+class CameraCredit():
+    """Flow control state of a single camera"""
+    __slots__ = ("camera_id", "outstanding", "interval", "granted_at", "received_at")
+
+    def __init__(self, camera_id: str, now: float):
+        self.camera_id = camera_id
+        self.outstanding = 0            # frames granted and not received yet
+        self.interval = 0.0             # last capture interval advertised
+        self.granted_at = now
+        self.received_at = now
+
+
+class FlowController():
+    """
+    Credit based flow control for the camera captures. Each camera may
+    only send the frames it has been granted, at the interval advertised
+    with the credits. The vision budget (frames per second the agent can
+    afford to score) is split between cameras, riskier cameras first,
+    and no credits are granted while the capture queue is over its high
+    water mark, so Unity stops rendering frames that would be dropped.
+    """
+    def __init__(self, budget_fps: float = 2.0, window: int = 2, high_water: int = 32,
+                 min_interval: float = 1.0, max_interval: float = 60.0, score_boost: float = 4.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.budget_fps = budget_fps
+        self.window = window                # credits a camera may hold at once
+        self.high_water = high_water        # queued frames above which no credits are granted
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.score_boost = score_boost      # extra share of the budget for a score of 1
+        self.clock = clock
+        self.cameras: dict[str, CameraCredit] = {}
+        self.unsolicited = 0                # frames received with no credit outstanding
+        self.stalled = 0                    # grants skipped because the queue was over high water
+
+    def __len__(self) -> int:
+        return len(self.cameras)
+
+    def received(self, camera_id: str):
+        now = self.clock()
+        credit = self.cameras.get(camera_id)
+        if credit is None:
+            credit = self.cameras[camera_id] = CameraCredit(camera_id, now)
+
+        if credit.outstanding > 0:
+            credit.outstanding -= 1
+        else:
+            self.unsolicited += 1
+        credit.received_at = now
+
+    def intervals(self, scores: dict[str, float], queue_depth: int) -> dict[str, float]:
+        """Capture interval of each camera, in seconds"""
+        weights = {camera_id: 1.0 + self.score_boost * scores.get(camera_id, 0.0) for camera_id in self.cameras}
+        total = sum(weights.values())
+        # frames still queued are budget already spent
+        load = max(1.0, queue_depth / self.high_water)
+
+        return {
+            camera_id: min(self.max_interval, max(self.min_interval, load * total / (weight * self.budget_fps)))
+            for camera_id, weight in weights.items()
+        }
+
+    def grants(self, scores: dict[str, float], queue_depth: int) -> list[tuple[str, int, float]]:
+        """
+        Credits to send now, as (camera_id, credits, interval). Cameras
+        whose credits have not been used for a few intervals are assumed
+        to have lost them (e.g. the simulation restarted) and are refilled.
+        """
+        if queue_depth >= self.high_water:
+            self.stalled += 1
+            return []
+
+        now = self.clock()
+        grants = []
+        for camera_id, interval in self.intervals(scores, queue_depth).items():
+            credit = self.cameras[camera_id]
+            if credit.outstanding > 0 and now - max(credit.received_at, credit.granted_at) > 3 * credit.interval + self.min_interval:
+                credit.outstanding = 0
+
+            amount = self.window - credit.outstanding
+            changed = abs(interval - credit.interval) > 0.1 * credit.interval
+            if amount <= 0 and not changed:
+                continue
+
+            credit.outstanding += amount
+            credit.interval = interval
+            credit.granted_at = now
+            grants.append((camera_id, amount, interval))
+
+        return grants
+
+    def outstanding(self) -> int:
+        return sum(credit.outstanding for credit in self.cameras.values())
+
+    def get_stats(self) -> dict:
+        return {
+            'cameras': len(self.cameras),
+            'outstanding': self.outstanding(),
+            'unsolicited': self.unsolicited,
+            'stalled': self.stalled,
+        }
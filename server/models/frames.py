@@ -0,0 +1,111 @@
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING
+import base64
+import io
+import os
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    import imagehash
+
+# size of the grayscale thumbnail returned for every frame,
+# small enough to be pickled back to the parent for free
+THUMBNAIL_SIZE = (32, 24)
+
+
+class FrameFeatures():
+    """Compact result of decoding a single camera frame"""
+    __slots__ = ("hash", "thumbnail", "size")
+
+    def __init__(self, hash: 'imagehash.ImageHash', thumbnail: bytes, size: tuple[int, int]):
+        self.hash = hash
+        self.thumbnail = thumbnail
+        self.size = size
+
+
+def _decode_frame(shm_name: str, length: int) -> tuple[str, bytes, tuple[int, int]]:
+    """
+    Worker side of the decoder. Attaches to the shared memory block
+    holding the base64 payload, decodes the PNG and returns only the
+    perceptual hash and a grayscale thumbnail.
+    """
+    # imported here so only the workers pay for PIL
+    from PIL import Image
+    import imagehash
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img_data = base64.b64decode(shm.buf[:length])
+    finally:
+        shm.close()
+
+    img = Image.open(io.BytesIO(img_data))
+    gray = img.convert("L")
+    thumbnail = gray.resize(THUMBNAIL_SIZE)
+
+    return str(imagehash.average_hash(gray)), thumbnail.tobytes(), img.size
+
+
+class FrameDecoder():
+    """
+    Decodes and hashes base64 frames on a pool of worker processes so
+    the CPU work is not serialised by the GIL. Frames are handed to the
+    workers through shared memory instead of pickled strings.
+    """
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: 'ProcessPoolExecutor' | None = None
+
+    @property
+    def pool(self) -> 'ProcessPoolExecutor':
+        # workers are only spawned once the first frame arrives
+        if self._pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def submit(self, b64img: str | memoryview) -> Future:
+        """Schedule a frame for decoding, returns a future of FrameFeatures"""
+        payload = b64img.encode("ascii") if isinstance(b64img, str) else b64img
+        shm = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+        shm.buf[:len(payload)] = payload
+
+        result: Future = Future()
+
+        def on_done(worker_future: Future):
+            # the block is only needed until the worker has read it
+            shm.close()
+            shm.unlink()
+
+            if worker_future.cancelled():
+                result.cancel()
+                return
+
+            error = worker_future.exception()
+            if error is not None:
+                result.set_exception(error)
+                return
+
+            import imagehash
+            hex_hash, thumbnail, size = worker_future.result()
+            result.set_result(FrameFeatures(imagehash.hex_to_hash(hex_hash), thumbnail, size))
+
+        try:
+            worker_future = self.pool.submit(_decode_frame, shm.name, len(payload))
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+
+        worker_future.add_done_callback(on_done)
+        return result
+
+    def decode(self, b64img: str | memoryview) -> FrameFeatures:
+        """Blocking helper, decodes a single frame"""
+        return self.submit(b64img).result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,215 @@
+from typing import Any, Iterator
+import numpy as np
+
+
+class OccupancyGrid():
+    """
+    Warehouse map stored as one integer code per (z, x, y) cell, 0 for
+    free space and i + 1 for an instance of kinds[i], plus a side table
+    with the object in every occupied cell. grid[z][x][y] reads and
+    writes like the nested lists it replaces, while whole floor queries
+    (counts, passability) are done on the code arrays.
+    """
+    def __init__(self, dimensions: tuple[int, int, int], empty: Any, kinds: tuple[type, ...]):
+        x, y, z = dimensions
+        self.shape = (z, x, y)
+        self.empty = empty      # value read back from free cells
+        self.kinds = kinds
+        self.codes = np.zeros(self.shape, dtype=np.int8)
+        self.occupants: dict[tuple[int, int, int], Any] = {}
+
+    def code(self, kind: type) -> int:
+        return self.kinds.index(kind) + 1
+
+    def code_of(self, value: Any) -> int:
+        if value is self.empty:
+            return 0
+
+        for i, kind in enumerate(self.kinds):
+            if isinstance(value, kind):
+                return i + 1
+
+        raise ValueError(f"Cannot place {value!r} in the grid")
+
+    def get(self, z: int, x: int, y: int) -> Any:
+        if self.codes[z, x, y] == 0:
+            return self.empty
+        return self.occupants[(z, x, y)]
+
+    def set(self, z: int, x: int, y: int, value: Any):
+        code = self.code_of(value)
+        self.codes[z, x, y] = code
+        if code == 0:
+            self.occupants.pop((z, x, y), None)
+        else:
+            self.occupants[(z, x, y)] = value
+
+    def column(self, x: int, y: int) -> list[Any]:
+        """Every level at (x, y), bottom first"""
+        return [self.get(z, x, y) for z in range(self.shape[0])]
+
+    def mask(self, kind: type, z: int = 0) -> np.ndarray:
+        """(x, y) bitmap of the cells holding a kind"""
+        return self.codes[z] == self.code(kind)
+
+    def count(self, kind: type, z: int = 0) -> int:
+        return int(np.count_nonzero(self.mask(kind, z)))
+
+    def passable(self, z: int = 0, *kinds: type) -> np.ndarray:
+        """(x, y) bitmap of free cells, and cells holding any of kinds"""
+        mask = self.codes[z] == 0
+        for kind in kinds:
+            mask |= self.codes[z] == self.code(kind)
+        return mask
+
+    def __copy__(self) -> 'OccupancyGrid':
+        # like copy() of the nested lists: a new grid object over the
+        # same cells, writes through either one are seen by both
+        view = object.__new__(OccupancyGrid)
+        view.__dict__.update(self.__dict__)
+        return view
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, z: int) -> 'GridLayer':
+        if not -self.shape[0] <= z < self.shape[0]:
+            raise IndexError("grid level out of range")
+        return GridLayer(self, z % self.shape[0])
+
+    def __iter__(self) -> Iterator['GridLayer']:
+        return (GridLayer(self, z) for z in range(self.shape[0]))
+
+
+class BeliefMap():
+    """
+    What one agent believes the map looks like: a base grid shared by
+    every agent, which agents never write to, plus a sparse overlay with
+    the cells where this agent has seen something different. Memory
+    grows with what the agent has observed instead of with the floor.
+    Reads and writes like an OccupancyGrid.
+    """
+    def __init__(self, base: OccupancyGrid, overlay: dict[tuple[int, int, int], Any] | None = None):
+        self.base = base
+        self.overlay: dict[tuple[int, int, int], Any] = overlay if overlay is not None else {}
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.base.shape
+
+    @property
+    def empty(self) -> Any:
+        return self.base.empty
+
+    @property
+    def kinds(self) -> tuple[type, ...]:
+        return self.base.kinds
+
+    def code(self, kind: type) -> int:
+        return self.base.code(kind)
+
+    def code_of(self, value: Any) -> int:
+        return self.base.code_of(value)
+
+    def get(self, z: int, x: int, y: int) -> Any:
+        key = (z, x, y)
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.base.get(z, x, y)
+
+    def set(self, z: int, x: int, y: int, value: Any):
+        self.code_of(value)     # same check as the grid
+        if self.base.get(z, x, y) is value:
+            # back to what everyone believes, nothing to remember
+            self.overlay.pop((z, x, y), None)
+        else:
+            self.overlay[(z, x, y)] = value
+
+    def column(self, x: int, y: int) -> list[Any]:
+        return [self.get(z, x, y) for z in range(self.shape[0])]
+
+    def codes_at(self, z: int = 0) -> np.ndarray:
+        """(x, y) codes of one level, with the overlay applied"""
+        codes = self.base.codes[z].copy()
+        for (cz, x, y), value in self.overlay.items():
+            if cz == z:
+                codes[x, y] = self.code_of(value)
+        return codes
+
+    def mask(self, kind: type, z: int = 0) -> np.ndarray:
+        return self.codes_at(z) == self.code(kind)
+
+    def count(self, kind: type, z: int = 0) -> int:
+        return int(np.count_nonzero(self.mask(kind, z)))
+
+    def passable(self, z: int = 0, *kinds: type) -> np.ndarray:
+        codes = self.codes_at(z)
+        mask = codes == 0
+        for kind in kinds:
+            mask |= codes == self.code(kind)
+        return mask
+
+    def snapshot(self) -> 'BeliefMap':
+        """Independent copy, costs as much as the overlay"""
+        return BeliefMap(self.base, dict(self.overlay))
+
+    def merge(self, other: 'BeliefMap'):
+        """Take in what other has observed, other wins where both differ"""
+        for (z, x, y), value in other.overlay.items():
+            self.set(z, x, y, value)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, z: int) -> 'GridLayer':
+        if not -self.shape[0] <= z < self.shape[0]:
+            raise IndexError("grid level out of range")
+        return GridLayer(self, z % self.shape[0])
+
+    def __iter__(self) -> Iterator['GridLayer']:
+        return (GridLayer(self, z) for z in range(self.shape[0]))
+
+
+class GridLayer():
+    __slots__ = ("grid", "z")
+
+    def __init__(self, grid: 'OccupancyGrid | BeliefMap', z: int):
+        self.grid = grid
+        self.z = z
+
+    def __len__(self) -> int:
+        return self.grid.shape[1]
+
+    def __getitem__(self, x: int) -> 'GridRow':
+        if not -self.grid.shape[1] <= x < self.grid.shape[1]:
+            raise IndexError("grid row out of range")
+        return GridRow(self.grid, self.z, x % self.grid.shape[1])
+
+    def __iter__(self) -> Iterator['GridRow']:
+        return (GridRow(self.grid, self.z, x) for x in range(self.grid.shape[1]))
+
+
+class GridRow():
+    __slots__ = ("grid", "z", "x")
+
+    def __init__(self, grid: 'OccupancyGrid | BeliefMap', z: int, x: int):
+        self.grid = grid
+        self.z = z
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.shape[2]
+
+    def __getitem__(self, y: int) -> Any:
+        return self.grid.get(self.z, self.x, self._index(y))
+
+    def __setitem__(self, y: int, value: Any):
+        self.grid.set(self.z, self.x, self._index(y), value)
+
+    def _index(self, y: int) -> int:
+        if not -self.grid.shape[2] <= y < self.grid.shape[2]:
+            raise IndexError("grid cell out of range")
+        return y % self.grid.shape[2]
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self.grid.get(self.z, self.x, y) for y in range(self.grid.shape[2]))
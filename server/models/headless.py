@@ -0,0 +1,55 @@
+from typing import Any
+
+
+class NullEmitter():
+    """Event sink for headless warehouse runs: counts events by type and drops them"""
+    def __init__(self):
+        self.event_counts: dict[str, int] = {}
+
+    def send_event(self, type: str, data: list[Any]) -> bool:
+        self.event_counts[type] = self.event_counts.get(type, 0) + 1
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FrameEmitter():
+    """
+    Batches the warehouse events into one event per step, so a client
+    gets a frame per step instead of a message per move. Events are
+    held until flush_on arrives (the end of a step), then sent as a
+    single frame_type event whose data has one entry per event: its
+    type and fields joined by "|", in the order they were sent. The
+    Unity client has no handler for frame_type events, this is for
+    other clients.
+    """
+    def __init__(self, ee: Any, frame_type: str = "step_frame", flush_on: str = "step_completed"):
+        self.ee = ee
+        self.frame_type = frame_type
+        self.flush_on = flush_on
+        self.frame: list[str] = []
+        self.frames = 0
+        self.event_counts: dict[str, int] = {}
+
+    def send_event(self, type: str, data: list[Any]) -> bool:
+        self.event_counts[type] = self.event_counts.get(type, 0) + 1
+        self.frame.append("|".join([type, *map(str, data)]))
+        if type == self.flush_on:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self.frame:
+            return
+        self.ee.send_event(self.frame_type, self.frame)
+        self.frame = []
+        self.frames += 1
+
+    def close(self):
+        self.flush()
+        if hasattr(self.ee, "close"):
+            self.ee.close()
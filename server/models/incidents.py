@@ -0,0 +1,119 @@
+from enum import Enum
+from typing import Callable
+import heapq
+import itertools
+import time
+
+
+class IncidentState(Enum):
+    QUEUED = "QUEUED"
+    DISPATCHED = "DISPATCHED"
+    RESOLVED = "RESOLVED"
+
+
+class Incident():
+    """A suspicious camera being handled by the guard"""
+    def __init__(self, camera_id: str, score: float, reported_at: float):
+        self.camera_id = camera_id
+        self.score = score
+        self.reported_at = reported_at
+        self.reports = 1
+        self.state = IncidentState.QUEUED
+        self.drone_id: str | None = None
+        self.move_id: int | None = None         # move of the drone that reaches the camera
+        self.dispatched_at: float | None = None
+        self.eta: float | None = None           # predicted arrival of the drone
+        self.prefetch = None                    # future of the early drone camera analysis
+        self.prefetch_frame = None              # drone camera frame the prefetch analyzes
+        self.resolved_at: float | None = None
+        self.alarmed = False
+
+
+class IncidentManager():
+    """
+    Keeps every open incident, at most one per camera. Queued incidents
+    are ordered by score, with an aging bonus so low scoring cameras are
+    not starved, and at most max_parallel of them are dispatched at once
+    (None means as many as there are drones).
+    """
+    def __init__(self, max_parallel: int | None = None, aging_rate: float = 0.01, clock: Callable[[], float] = time.monotonic):
+        self.max_parallel = max_parallel
+        self.aging_rate = aging_rate    # score gained per second spent in the queue
+        self.clock = clock
+        self.open: dict[str, Incident] = {}         # camera id -> open incident
+        self.dispatched: dict[str, Incident] = {}   # drone id -> incident
+        self.resolved: list[Incident] = []
+        self.duplicates = 0
+        self._queue: list[tuple[float, int, Incident]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.open)
+
+    def queued(self) -> int:
+        return len(self.open) - len(self.dispatched)
+
+    def _push(self, incident: Incident):
+        # score + aging_rate * (now - reported_at) grows at the same
+        # rate for everyone, so the order only depends on this key
+        key = self.aging_rate * incident.reported_at - incident.score
+        heapq.heappush(self._queue, (key, next(self._counter), incident))
+
+    def report(self, camera_id: str, score: float) -> Incident | None:
+        """Open an incident for camera_id, returns None if one is already open"""
+        incident = self.open.get(camera_id)
+        if incident is not None:
+            self.duplicates += 1
+            incident.reports += 1
+            if score > incident.score:
+                incident.score = score
+                if incident.state == IncidentState.QUEUED:
+                    # the old heap entry is skipped once it surfaces
+                    self._push(incident)
+            return None
+
+        incident = Incident(camera_id, score, self.clock())
+        self.open[camera_id] = incident
+        self._push(incident)
+        return incident
+
+    def can_dispatch(self) -> bool:
+        return self.max_parallel is None or len(self.dispatched) < self.max_parallel
+
+    def peek(self) -> Incident | None:
+        """Highest priority queued incident"""
+        while self._queue:
+            key, _, incident = self._queue[0]
+            stale = incident.state != IncidentState.QUEUED or key != self.aging_rate * incident.reported_at - incident.score
+            if not stale:
+                return incident
+
+            heapq.heappop(self._queue)
+
+        return None
+
+    def dispatch(self, incident: Incident, drone_id: str, move_id: int, travel_time: float | None = None):
+        incident.state = IncidentState.DISPATCHED
+        incident.drone_id = drone_id
+        incident.move_id = move_id
+        incident.dispatched_at = self.clock()
+        if travel_time is not None:
+            incident.eta = incident.dispatched_at + travel_time
+        self.dispatched[drone_id] = incident
+
+    def resolve(self, incident: Incident, alarmed: bool):
+        incident.state = IncidentState.RESOLVED
+        incident.resolved_at = self.clock()
+        incident.alarmed = alarmed
+        del self.dispatched[incident.drone_id]
+        del self.open[incident.camera_id]
+        self.resolved.append(incident)
+
+    def expected_wait(self) -> float:
+        """Average predicted travel time of the incidents dispatched so far"""
+        waits = [
+            incident.eta - incident.dispatched_at
+            for incident in itertools.chain(self.dispatched.values(), self.resolved)
+            if incident.eta is not None
+        ]
+        return sum(waits) / len(waits) if waits else 0.0
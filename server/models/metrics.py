@@ -0,0 +1,129 @@
+from typing import Callable
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram():
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics():
+    """
+    In-process counters, gauges and histograms, rendered in the
+    Prometheus text format. Collectors registered with add_collector
+    run on every scrape, to sample values that are cheaper to read
+    than to track (queue depths, drone states).
+    """
+    def __init__(self):
+        self.kinds: dict[str, str] = {}
+        self.values: dict[str, dict[tuple, float | Histogram]] = {}
+        self.collectors: list[Callable[['Metrics'], None]] = []
+        self.lock = threading.Lock()
+
+    def _series(self, name: str, kind: str) -> dict:
+        if name not in self.kinds:
+            self.kinds[name] = kind
+            self.values[name] = {}
+        return self.values[name]
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self._series(name, "counter")
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, kind: str = "gauge", **labels):
+        """Set a gauge, or a counter tracked somewhere else"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self._series(name, kind)[key] = value
+
+    def observe(self, name: str, value: float, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **labels):
+        """Record a value in a histogram"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self._series(name, "histogram")
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def add_collector(self, collector: Callable[['Metrics'], None]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector(self)
+
+        lines = []
+        with self.lock:
+            for name, kind in self.kinds.items():
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in self.values[name].items():
+                    if kind == "histogram":
+                        cumulative = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{_labels(key + (('le', bound),))} {cumulative}")
+                        lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {value.count}")
+                        lines.append(f"{name}_sum{_labels(key)} {value.sum}")
+                        lines.append(f"{name}_count{_labels(key)} {value.count}")
+                    else:
+                        lines.append(f"{name}{_labels(key)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+class MetricsServer():
+    """Serves a Metrics instance on /metrics from a background thread"""
+    def __init__(self, metrics: Metrics, port: int = 9100, host: str = "localhost"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep scrapes out of the simulation output
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        print(f"[DEBUG] Metrics available at http://{self.httpd.server_address[0]}:{self.httpd.server_address[1]}/metrics")
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,59 @@
+import threading
+import numpy as np
+
+from .frames import THUMBNAIL_SIZE
+
+
+class MotionGate():
+    """
+    Decides whether a camera frame changed enough to be worth scoring.
+    Each camera keeps a slowly adapting grayscale background built from
+    the decoder thumbnails, a frame passes the gate when the fraction of
+    pixels that differ from it reaches motion_ratio.
+    """
+    def __init__(self, pixel_threshold: int = 25, motion_ratio: float = 0.01, adaptation_rate: float = 0.05):
+        self.pixel_threshold = pixel_threshold      # gray levels a pixel must change by
+        self.motion_ratio = motion_ratio            # fraction of changed pixels that counts as motion
+        self.adaptation_rate = adaptation_rate      # weight of each new frame in the background
+        self.backgrounds: dict[str, np.ndarray] = {}
+        self.passed = 0
+        self.blocked = 0
+        self.lock = threading.Lock()
+
+    def check(self, camera_id: str, thumbnail: bytes) -> bool:
+        """Returns True if the frame shows motion against the background"""
+        width, height = THUMBNAIL_SIZE
+        frame = np.frombuffer(thumbnail, dtype=np.uint8).reshape(height, width).astype(np.float32)
+
+        with self.lock:
+            background = self.backgrounds.get(camera_id)
+            if background is None:
+                # nothing to compare against yet
+                self.backgrounds[camera_id] = frame
+                self.passed += 1
+                return True
+
+            changed = np.abs(frame - background) > self.pixel_threshold
+            moving = changed.mean() >= self.motion_ratio
+
+            # blend the new frame in, so lighting drift and objects
+            # that stop moving become part of the background
+            background += self.adaptation_rate * (frame - background)
+
+            if moving:
+                self.passed += 1
+            else:
+                self.blocked += 1
+
+            return moving
+
+    def pass_rate(self) -> float:
+        total = self.passed + self.blocked
+        return self.passed / total if total else 0.0
+
+    def get_stats(self):
+        return {
+            'passed': self.passed,
+            'blocked': self.blocked,
+            'pass_rate': self.pass_rate()
+        }
@@ -0,0 +1,285 @@
+from collections import deque
+from typing import Any, Iterable
+import heapq
+
+# same order the agents always explored in: +y, +x, -y, -x
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+class PathGrid():
+    """
+    Walkable cells of one floor, flattened to a bytearray indexed by
+    x * height + y so searches only touch ints. Built from a NumPy
+    boolean bitmap (cheap) or from nested lists of booleans.
+
+    Every search returns the cells from start to goal, both included,
+    as (x, y) tuples, or None when the goal can't be reached. The start
+    cell never needs to be walkable, and the goal of astar/jps may be
+    an obstacle (a storage is reached by standing next to it).
+    """
+    def __init__(self, walkable: Any):
+        if hasattr(walkable, "tobytes"):
+            self.width, self.height = walkable.shape
+            self.cells = bytearray(walkable.astype(bool).tobytes())
+        else:
+            rows = [list(row) for row in walkable]
+            self.width, self.height = len(rows), len(rows[0]) if rows else 0
+            self.cells = bytearray(bool(cell) for row in rows for cell in row)
+        self._tables: dict | None = None    # jump point search tables, built on first use
+
+    def index(self, cell: tuple[int, int]) -> int:
+        return cell[0] * self.height + cell[1]
+
+    def cell(self, index: int) -> tuple[int, int]:
+        return divmod(index, self.height)
+
+    def is_walkable(self, cell: tuple[int, int]) -> bool:
+        x, y = cell
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.cells[x * self.height + y])
+
+    def neighbours(self, index: int) -> Iterable[int]:
+        height = self.height
+        y = index % height
+        if y + 1 < height:
+            yield index + 1
+        if index + height < len(self.cells):
+            yield index + height
+        if y > 0:
+            yield index - 1
+        if index >= height:
+            yield index - height
+
+    def _path(self, parents: dict[int, int], end: int) -> list[tuple[int, int]]:
+        path = [self.cell(end)]
+        while end in parents:
+            end = parents[end]
+            path.append(self.cell(end))
+        path.reverse()
+        return path
+
+    def bfs_nearest(self, start: tuple[int, int], targets: Any) -> list[tuple[int, int]] | None:
+        """
+        Shortest path to the closest cell in targets, a set of (x, y)
+        cells or a boolean bitmap shaped like the floor. Targets must be
+        walkable to be reached (objects are walked into to be picked up).
+        """
+        if hasattr(targets, "tobytes"):
+            is_target = targets.astype(bool).tobytes()
+        else:
+            is_target = bytearray(len(self.cells))
+            for cell in targets:
+                is_target[self.index(cell)] = 1
+
+        source = self.index(start)
+        cells = self.cells
+        parents: dict[int, int] = {}
+        visited = bytearray(len(cells))
+        visited[source] = 1
+        frontier = deque([source])
+
+        while frontier:
+            current = frontier.popleft()
+            if is_target[current]:
+                return self._path(parents, current)
+
+            for nxt in self.neighbours(current):
+                if not visited[nxt] and cells[nxt]:
+                    visited[nxt] = 1
+                    parents[nxt] = current
+                    frontier.append(nxt)
+
+        return None
+
+    def distances(self, sources: Iterable[tuple[int, int]]) -> list[int]:
+        """BFS distance of every cell to the nearest source, -1 if unreachable"""
+        cells = self.cells
+        dist = [-1] * len(cells)
+        frontier = deque()
+        for cell in sources:
+            index = self.index(cell)
+            dist[index] = 0
+            frontier.append(index)
+
+        while frontier:
+            current = frontier.popleft()
+            step = dist[current] + 1
+            for nxt in self.neighbours(current):
+                if dist[nxt] < 0 and cells[nxt]:
+                    dist[nxt] = step
+                    frontier.append(nxt)
+
+        return dist
+
+    def astar(self, start: tuple[int, int], goal: tuple[int, int]) -> list[tuple[int, int]] | None:
+        """A* with the Manhattan distance, exact on a 4-connected grid"""
+        height = self.height
+        source, target = self.index(start), self.index(goal)
+        gx, gy = goal
+        cells = self.cells
+
+        g = {source: 0}
+        parents: dict[int, int] = {}
+        closed = bytearray(len(cells))
+        # ties on f go to the deeper node, which is closer to the goal
+        frontier = [(abs(start[0] - gx) + abs(start[1] - gy), 0, source)]
+
+        while frontier:
+            _, neg_g, current = heapq.heappop(frontier)
+            if current == target:
+                return self._path(parents, current)
+            if closed[current]:
+                continue
+            closed[current] = 1
+
+            step = -neg_g + 1
+            for nxt in self.neighbours(current):
+                if closed[nxt] or not (cells[nxt] or nxt == target):
+                    continue
+                if step < g.get(nxt, step + 1):
+                    g[nxt] = step
+                    parents[nxt] = current
+                    x, y = divmod(nxt, height)
+                    heapq.heappush(frontier, (step + abs(x - gx) + abs(y - gy), -step, nxt))
+
+        return None
+
+    def _jump_tables(self):
+        """
+        Goal independent part of the jump point search, computed once
+        per grid: for every cell and direction, the steps to the next
+        jump point of a straight scan (0 if a wall comes first) and the
+        open cells before that wall.
+        """
+        import numpy as np
+
+        walkable = np.frombuffer(bytes(self.cells), dtype=bool).reshape(self.width, self.height)
+        padded = np.pad(walkable, 1)    # outside the floor is blocked
+
+        def scan(open_: np.ndarray, mark: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+            # scans towards increasing axis 1
+            jump = np.zeros(open_.shape, dtype=np.int32)
+            wall = np.zeros(open_.shape, dtype=np.int32)
+            nxt = np.zeros(open_.shape[0], dtype=np.int32)
+            run = np.zeros(open_.shape[0], dtype=np.int32)
+            for i in range(open_.shape[1] - 1, -1, -1):
+                jump[:, i] = nxt
+                wall[:, i] = run
+                run = np.where(open_[:, i], run + 1, 0)
+                nxt = np.where(open_[:, i], np.where(mark[:, i], 1, np.where(nxt > 0, nxt + 1, 0)), 0)
+            return jump, wall
+
+        # a vertical scan stops where a side cell opens up behind an obstacle
+        left, right = padded[:-2, 1:-1], padded[2:, 1:-1]
+        forced_up = walkable & ((left & ~padded[:-2, :-2]) | (right & ~padded[2:, :-2]))
+        forced_down = walkable & ((left & ~padded[:-2, 2:]) | (right & ~padded[2:, 2:]))
+
+        up_jump, up_wall = scan(walkable, forced_up)
+        down_jump, down_wall = scan(walkable[:, ::-1], forced_down[:, ::-1])
+        down_jump, down_wall = down_jump[:, ::-1], down_wall[:, ::-1]
+
+        # a horizontal scan stops where either vertical scan finds something
+        finds = walkable & ((up_jump > 0) | (down_jump > 0))
+        right_jump, right_wall = scan(walkable.T, finds.T)
+        left_jump, left_wall = scan(walkable.T[:, ::-1], finds.T[:, ::-1])
+
+        self._tables = {
+            (0, 1): (up_jump.ravel().tolist(), up_wall.ravel().tolist()),
+            (0, -1): (down_jump.ravel().tolist(), down_wall.ravel().tolist()),
+            (1, 0): (right_jump.T.ravel().tolist(), right_wall.T.ravel().tolist()),
+            (-1, 0): (left_jump[:, ::-1].T.ravel().tolist(), left_wall[:, ::-1].T.ravel().tolist()),
+        }
+        return self._tables
+
+    def jps(self, start: tuple[int, int], goal: tuple[int, int]) -> list[tuple[int, int]] | None:
+        """
+        Jump point search for 4-connected grids. A vertical scan stops at
+        the goal or where an obstacle beside it ends (a forced turn), a
+        horizontal scan stops where a vertical scan from one of its cells
+        would. Scans are read from precomputed tables, so only the cells
+        where they stop are pushed to the open list, which pays off on
+        open floors. Cells next to the goal are always stopped at, so an
+        obstacle goal (a storage) can be turned into.
+        """
+        tables = self._tables or self._jump_tables()
+        height = self.height
+        gx, gy = goal
+
+        def jump(x: int, y: int, dx: int, dy: int) -> tuple[int, int] | None:
+            jumps, walls = tables[(dx, dy)]
+            index = x * height + y
+            steps, wall = jumps[index], walls[index]
+
+            # distance along the scan to the goal row/column, if the scan runs next to it
+            if dx == 0 and abs(x - gx) <= 1:
+                to_goal = (gy - y) * dy
+                if 0 < to_goal <= wall or (x == gx and to_goal == wall + 1):
+                    steps = to_goal if steps == 0 else min(steps, to_goal)
+            elif dy == 0:
+                for column in (gx - dx, gx, gx + dx):
+                    to_goal = (column - x) * dx
+                    if 0 < to_goal <= wall or ((column, y) == goal and to_goal == wall + 1):
+                        steps = to_goal if steps == 0 else min(steps, to_goal)
+                        break
+
+            return (x + dx * steps, y + dy * steps) if steps else None
+
+        def successors(node: tuple[int, int], came: tuple[int, int] | None) -> Iterable[tuple[int, int]]:
+            x, y = node
+            if came is None:
+                moves = DIRECTIONS
+            elif came[1] == 0:
+                # moving horizontally: keep going or turn either way
+                moves = ((came[0], 0), (0, 1), (0, -1))
+            else:
+                moves = ((0, came[1]), (1, 0), (-1, 0))
+
+            for dx, dy in moves:
+                found = jump(x, y, dx, dy)
+                if found is not None:
+                    yield found
+
+        g = {start: 0}
+        parents: dict[tuple[int, int], tuple[int, int]] = {}
+        closed = set()
+        frontier = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start)]
+
+        while frontier:
+            _, neg_g, current = heapq.heappop(frontier)
+            if current == goal:
+                return self._expand(parents, current)
+            if current in closed:
+                continue
+            closed.add(current)
+
+            parent = parents.get(current)
+            came = None
+            if parent is not None:
+                came = ((current[0] > parent[0]) - (current[0] < parent[0]), (current[1] > parent[1]) - (current[1] < parent[1]))
+
+            for nxt in successors(current, came):
+                if nxt in closed:
+                    continue
+                step = -neg_g + abs(nxt[0] - current[0]) + abs(nxt[1] - current[1])
+                if step < g.get(nxt, step + 1):
+                    g[nxt] = step
+                    parents[nxt] = current
+                    heapq.heappush(frontier, (step + abs(nxt[0] - gx) + abs(nxt[1] - gy), -step, nxt))
+
+        return None
+
+    def _expand(self, parents: dict[tuple[int, int], tuple[int, int]], end: tuple[int, int]) -> list[tuple[int, int]]:
+        """Fill in the straight runs between jump points"""
+        points = [end]
+        while end in parents:
+            end = parents[end]
+            points.append(end)
+        points.reverse()
+
+        path = [points[0]]
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            dx, dy = (x1 > x0) - (x1 < x0), (y1 > y0) - (y1 < y0)
+            x, y = x0, y0
+            while (x, y) != (x1, y1):
+                x, y = x + dx, y + dy
+                path.append((x, y))
+        return path
@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class PatrolPlanner():
+    """
+    Closed patrol tour over the fixed camera locations. The tour is
+    built with nearest-neighbour and improved with 2-opt, new cameras
+    are added by cheapest insertion instead of replanning from scratch.
+    Every full lap the tour is rebuilt, pulling cameras with a high
+    recent score towards the front.
+    """
+    def __init__(self, score_bias: float = 0.5, max_passes: int = 10):
+        self.score_bias = score_bias    # how much a score of 1 shortens the way to a camera
+        self.max_passes = max_passes    # 2-opt passes per (re)plan
+        self.camera_ids: list[str] = []
+        self.points = np.zeros((0, 3), dtype=np.float64)
+        self.dist = np.zeros((0, 0), dtype=np.float64)
+        self.tour: list[int] = []       # indices into camera_ids
+        self.position = 0               # next stop in the tour
+        self.visits = 0
+
+    def __len__(self) -> int:
+        return len(self.camera_ids)
+
+    def __contains__(self, camera_id: str) -> bool:
+        return camera_id in self.camera_ids
+
+    def add(self, camera_id: str, point: tuple[float, ...]):
+        """Add a camera to the tour at the cheapest position"""
+        point = np.asarray(point[:3], dtype=np.float64)
+        row = np.linalg.norm(self.points - point, axis=1)
+
+        count = len(self.camera_ids)
+        dist = np.zeros((count + 1, count + 1), dtype=np.float64)
+        dist[:count, :count] = self.dist
+        dist[count, :count] = row
+        dist[:count, count] = row
+
+        self.camera_ids.append(camera_id)
+        self.points = np.vstack([self.points, point])
+        self.dist = dist
+
+        if len(self.tour) < 2:
+            self.tour.append(count)
+            return
+
+        tour = np.asarray(self.tour)
+        after = np.roll(tour, -1)
+        cost = dist[tour, count] + dist[count, after] - dist[tour, after]
+        slot = int(np.argmin(cost)) + 1
+        self.tour.insert(slot, count)
+        if slot <= self.position:
+            self.position += 1
+
+        # 2-opt can reverse the stretch the cursor is in, keep it on
+        # the camera that was next before the reorder
+        upcoming = self.tour[self.position] if self.position < len(self.tour) else None
+        self.tour = self._two_opt(self.tour, self.dist)
+        if upcoming is not None:
+            self.position = self.tour.index(upcoming)
+
+    def replan(self, weights: np.ndarray | None = None):
+        """
+        Rebuild the whole tour. weights (0..1 per camera, in the order
+        cameras were added) make high scoring cameras look closer
+        while the tour is constructed.
+        """
+        count = len(self.camera_ids)
+        if count < 2:
+            self.tour = list(range(count))
+            self.position = 0
+            return
+
+        cost = self.dist
+        if weights is not None:
+            cost = self.dist * (1 - self.score_bias * np.clip(weights, 0, 1))[None, :]
+
+        start = int(np.argmax(weights)) if weights is not None else 0
+        tour = [start]
+        visited = np.zeros(count, dtype=bool)
+        visited[start] = True
+        for _ in range(count - 1):
+            candidates = np.where(visited, np.inf, cost[tour[-1]])
+            nxt = int(np.argmin(candidates))
+            tour.append(nxt)
+            visited[nxt] = True
+
+        # 2-opt runs on the real distances so the route stays short
+        self.tour = self._two_opt(tour, self.dist)
+        self.position = 0
+
+    def _two_opt(self, tour: list[int], dist: np.ndarray) -> list[int]:
+        tour = np.asarray(tour)
+        count = len(tour)
+        if count < 4:
+            return tour.tolist()
+
+        for _ in range(self.max_passes):
+            improved = False
+            for i in range(count - 2):
+                a, b = tour[i], tour[i + 1]
+                # candidate edges (c, d) after (a, b), the last one closes the loop
+                j = np.arange(i + 2, count if i > 0 else count - 1)
+                c = tour[j]
+                d = tour[(j + 1) % count]
+                delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+                best = int(np.argmin(delta))
+                if delta[best] < -1e-9:
+                    k = j[best]
+                    tour[i + 1:k + 1] = tour[i + 1:k + 1][::-1].copy()
+                    improved = True
+
+            if not improved:
+                break
+
+        return tour.tolist()
+
+    def length(self) -> float:
+        if len(self.tour) < 2:
+            return 0.0
+
+        tour = np.asarray(self.tour)
+        return float(self.dist[tour, np.roll(tour, -1)].sum())
+
+    def next_waypoint(self) -> str | None:
+        """Next camera to visit, None while the tour is empty"""
+        if not self.tour:
+            return None
+
+        if self.position >= len(self.tour):
+            self.position = 0
+
+        camera_id = self.camera_ids[self.tour[self.position]]
+        self.position += 1
+        self.visits += 1
+        return camera_id
+
+    def lap_completed(self) -> bool:
+        return self.position >= len(self.tour)
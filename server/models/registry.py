@@ -0,0 +1,124 @@
+from typing import Iterator
+import math
+import numpy as np
+import time
+
+from .spatial import SpatialGrid
+
+# x, y, z, xrot, yrot, zrot
+POSE_FIELDS = 6
+
+
+class CameraRecord():
+    """Per-camera state that does not fit in the registry arrays"""
+    __slots__ = ("index", "camera_id", "image", "image_hash", "thumbnail", "cached_score", "is_drone")
+
+    def __init__(self, index: int, camera_id: str, is_drone: bool = False):
+        self.index = index
+        self.camera_id = camera_id
+        self.image = None           # latest CameraFrame
+        self.image_hash = None      # perceptual hash of the last analyzed frame
+        self.thumbnail = None       # grayscale thumbnail of the latest frame
+        self.cached_score = None    # score that belongs to image_hash
+        self.is_drone = is_drone
+
+
+class CameraRegistry():
+    """
+    Registry of every camera seen by the server. Each camera gets an
+    integer index on first sight, numeric columns (pose, score, last
+    update) live in NumPy arrays indexed by it so the decision loop
+    can run vectorised queries over all cameras at once. Positions are
+    also kept in a spatial grid for proximity queries.
+    """
+    def __init__(self, capacity: int = 64, cell_size: float = 10.0):
+        self.ids: dict[str, int] = {}
+        self.index = SpatialGrid(cell_size)
+        self.records: list[CameraRecord] = []
+        self.poses = np.zeros((capacity, POSE_FIELDS), dtype=np.float64)
+        self.scores = np.full(capacity, np.nan, dtype=np.float64)
+        self.updated_at = np.zeros(capacity, dtype=np.float64)
+        self.scored_at = np.zeros(capacity, dtype=np.float64)
+        self.is_drone = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, camera_id: str) -> bool:
+        return camera_id in self.ids
+
+    def __iter__(self) -> Iterator[CameraRecord]:
+        return iter(self.records)
+
+    def get(self, camera_id: str) -> CameraRecord:
+        return self.records[self.ids[camera_id]]
+
+    def _grow(self):
+        capacity = len(self.scores) * 2
+        poses = np.zeros((capacity, POSE_FIELDS), dtype=np.float64)
+        poses[:len(self.poses)] = self.poses
+        scores = np.full(capacity, np.nan, dtype=np.float64)
+        scores[:len(self.scores)] = self.scores
+        updated_at = np.zeros(capacity, dtype=np.float64)
+        updated_at[:len(self.updated_at)] = self.updated_at
+        scored_at = np.zeros(capacity, dtype=np.float64)
+        scored_at[:len(self.scored_at)] = self.scored_at
+        is_drone = np.zeros(capacity, dtype=bool)
+        is_drone[:len(self.is_drone)] = self.is_drone
+
+        self.poses, self.scores, self.updated_at, self.scored_at, self.is_drone = \
+            poses, scores, updated_at, scored_at, is_drone
+
+    def update(self, camera_id: str, pose: tuple[float, ...], image: str, is_drone: bool = False) -> CameraRecord:
+        """Insert or refresh a camera with its latest pose and frame"""
+        index = self.ids.get(camera_id)
+        if index is None:
+            index = len(self.records)
+            if index == len(self.scores):
+                self._grow()
+
+            self.ids[camera_id] = index
+            self.records.append(CameraRecord(index, camera_id, is_drone))
+            self.is_drone[index] = is_drone
+
+        record = self.records[index]
+        record.image = image
+        self.poses[index] = pose
+        self.updated_at[index] = time.time()
+        self.index.insert(camera_id, pose[:3])
+
+        return record
+
+    def pose(self, camera_id: str) -> tuple[float, ...]:
+        return tuple(self.poses[self.ids[camera_id]].tolist())
+
+    def score(self, camera_id: str) -> float | None:
+        index = self.ids.get(camera_id)
+        if index is None or np.isnan(self.scores[index]):
+            return None
+
+        return float(self.scores[index])
+
+    def set_score(self, camera_id: str, score: float):
+        self.scores[self.ids[camera_id]] = score
+
+    def mark_scored(self, camera_id: str):
+        """The vision model just scored the latest frame of camera_id"""
+        self.scored_at[self.ids[camera_id]] = time.time()
+
+    def scored_since(self, since: float) -> np.ndarray:
+        """Mask of the cameras the vision model scored at or after since"""
+        return self.scored_at[:len(self.records)] >= since
+
+    def nearest(self, point: tuple[float, ...], k: int = 1, fixed_only: bool = True) -> list[str]:
+        """Up to k cameras closest to point, closest first"""
+        predicate = (lambda camera_id: not self.is_drone[self.ids[camera_id]]) if fixed_only else None
+        return self.index.k_nearest(point[:3], k, predicate)
+
+    def within(self, point: tuple[float, ...], radius: float, fixed_only: bool = True) -> list[str]:
+        """Cameras at most radius away from point, closest first"""
+        found = self.index.within(point[:3], radius)
+        if fixed_only:
+            found = [camera_id for camera_id in found if not self.is_drone[self.ids[camera_id]]]
+
+        return sorted(found, key=lambda camera_id: math.dist(point[:3], self.index.points[camera_id]))
@@ -0,0 +1,76 @@
+from typing import Iterable
+import numpy as np
+
+from .incidents import Incident
+
+RESPONSE_WINDOW = 300.0     # alarms more than 5 minutes after any activity are false positives
+
+
+def save_run(path: str, alarms: Iterable[float], activities: Iterable[float], activity_cameras: Iterable[str],
+             incidents: Iterable[Incident] = (), **meta: float):
+    """
+    Write the events of a run to a compressed .npz file, one array per
+    column. Timestamps are unix seconds, incident times are the guard
+    clock (only differences between them are meaningful).
+    """
+    incidents = list(incidents)
+    columns = {
+        'alarms': np.asarray(list(alarms), dtype=np.float64),
+        'activities': np.asarray(list(activities), dtype=np.float64),
+        'activity_cameras': np.asarray(list(activity_cameras), dtype=np.str_),
+        'incident_cameras': np.asarray([i.camera_id for i in incidents], dtype=np.str_),
+        'incident_drones': np.asarray([i.drone_id or "" for i in incidents], dtype=np.str_),
+        'incident_scores': np.asarray([i.score for i in incidents], dtype=np.float64),
+        'incident_reports': np.asarray([i.reports for i in incidents], dtype=np.int32),
+        'incident_reported_at': np.asarray([i.reported_at for i in incidents], dtype=np.float64),
+        'incident_dispatched_at': np.asarray([_or_nan(i.dispatched_at) for i in incidents], dtype=np.float64),
+        'incident_eta': np.asarray([_or_nan(i.eta) for i in incidents], dtype=np.float64),
+        'incident_resolved_at': np.asarray([_or_nan(i.resolved_at) for i in incidents], dtype=np.float64),
+        'incident_alarmed': np.asarray([i.alarmed for i in incidents], dtype=bool),
+    }
+    for key, value in meta.items():
+        columns[f"meta_{key}"] = np.asarray(value)
+
+    np.savez_compressed(path, **columns)
+
+
+def load_run(path: str) -> dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _or_nan(value: float | None) -> float:
+    return np.nan if value is None else value
+
+
+def match_alarms(alarms: np.ndarray, activities: np.ndarray, window: float = RESPONSE_WINDOW) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pair every alarm with the latest suspicious activity before it.
+    Returns the response time of each alarm (NaN when unmatched) and
+    the mask of alarms with no activity in the preceding window.
+    """
+    alarms = np.asarray(alarms, dtype=np.float64)
+    activities = np.sort(np.asarray(activities, dtype=np.float64))
+
+    # index of the last activity strictly before each alarm
+    previous = np.searchsorted(activities, alarms, side='left') - 1
+    has_previous = previous >= 0
+    response = np.full(alarms.shape, np.nan)
+    response[has_previous] = alarms[has_previous] - activities[previous[has_previous]]
+
+    false_positive = ~(response < window)     # NaN compares False
+    response[false_positive] = np.nan
+    return response, false_positive
+
+
+def summarize(alarms: np.ndarray, activities: np.ndarray, window: float = RESPONSE_WINDOW) -> dict:
+    response, false_positive = match_alarms(alarms, activities, window)
+    total = len(response)
+    valid = total - int(false_positive.sum())
+    return {
+        'average_response_time': float(np.nanmean(response)) if valid else 0,
+        'false_positive_rate': (total - valid) / total if total else 0,
+        'total_alarms': total,
+        'valid_alarms': valid,
+        'false_positives': total - valid,
+    }
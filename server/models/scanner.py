@@ -0,0 +1,167 @@
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Iterable
+import base64
+import json
+import os
+import threading
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from openai import OpenAI
+
+
+class ObjectScanner():
+    """
+    Labels warehouse objects from their image, shared by every agent.
+    The label of an image source never changes, so each source is sent
+    to the vision model once: labels are memoised (and kept in
+    labels_path between runs when given), images are encoded once, and
+    agents scanning the same source at the same time wait on the same
+    request. One OpenAI client is reused for all of them.
+    """
+    def __init__(self, objects_dir: str = os.path.join("server", "objects"), labels_path: str | None = None,
+                 model: str = "gpt-4o-mini", max_workers: int = 4):
+        self.objects_dir = objects_dir
+        self.labels_path = labels_path
+        self.model = model
+        self.max_workers = max_workers
+
+        self._names: list[str] | None = None
+        self._images: dict[str, str] = {}       # image_src -> base64
+        self.labels: dict[str, str] = {}        # image_src -> label
+        self._pending: dict[str, Future] = {}   # image_src -> request in flight
+        # reentrant, a request that is already done calls _finish from submit
+        self._lock = threading.RLock()
+        self._oai: 'OpenAI' | None = None
+        self._pool: 'ThreadPoolExecutor' | None = None
+        self.requests = 0
+
+        if labels_path is not None and os.path.exists(labels_path):
+            with open(labels_path) as f:
+                labels = json.load(f)
+            # older files may hold replies that are not labels, scan those again
+            if os.path.isdir(objects_dir):
+                labels = {src: label for src, label in labels.items() if label in self.names}
+            self.labels.update(labels)
+
+    @property
+    def oai(self) -> 'OpenAI':
+        with self._lock:
+            if self._oai is None:
+                from dotenv import load_dotenv
+                from openai import OpenAI
+
+                load_dotenv()
+                self._oai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            return self._oai
+
+    @property
+    def pool(self) -> 'ThreadPoolExecutor':
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    @property
+    def names(self) -> list[str]:
+        """The labels the model picks from, one per image in objects_dir"""
+        if self._names is None:
+            self._names = [src.split(".")[0] for src in os.listdir(self.objects_dir)]
+        return self._names
+
+    def encode(self, image_src: str) -> str:
+        image = self._images.get(image_src)
+        if image is None:
+            with open(os.path.join(self.objects_dir, image_src), "rb") as image_file:
+                image = base64.b64encode(image_file.read()).decode('utf-8')
+            self._images[image_src] = image
+        return image
+
+    def submit(self, image_src: str) -> Future:
+        """Future of the label of image_src, shared with any scan already running"""
+        with self._lock:
+            if image_src in self.labels:
+                done: Future = Future()
+                done.set_result(self.labels[image_src])
+                return done
+
+            future = self._pending.get(image_src)
+            if future is None:
+                future = self.pool.submit(self._request, image_src)
+                self._pending[image_src] = future
+                future.add_done_callback(lambda f: self._finish(image_src, f))
+            return future
+
+    def scan(self, image_src: str) -> str:
+        return self.submit(image_src).result()
+
+    def prefetch(self, image_srcs: Iterable[str]):
+        """Start labelling every distinct source in the background"""
+        for image_src in set(image_srcs):
+            self.submit(image_src)
+
+    def _request(self, image_src: str) -> str:
+        base64_image = self.encode(image_src)
+
+        completion = self.oai.chat.completions.create(
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"You are a simple vision model. Your task is to see the image provided by the user and reply with the closest label on this list: {', '.join(self.names)}"
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{base64_image}"
+                            }
+                        }
+                    ]
+                }
+            ],
+            model=self.model,
+            max_completion_tokens=25,
+            temperature=0.1,
+        )
+        self.requests += 1
+
+        maybe_response = completion.choices[0].message.content
+
+        if maybe_response is None:
+            raise Exception("Model response was empty")
+
+        return self.match(maybe_response)
+
+    def match(self, response: str) -> str:
+        """The label of names the model replied with, ignoring case, quotes and punctuation"""
+        labels = {name.lower(): name for name in self.names}
+        label = labels.get(response.strip().strip(" \t\n\"'`.,;:!").lower())
+        if label is None:
+            # not memoised, the next scan of the image asks again
+            raise ValueError(f"Model replied {response!r}, which is not one of the labels")
+
+        return label
+
+    def _finish(self, image_src: str, future: Future):
+        with self._lock:
+            self._pending.pop(image_src, None)
+            # failed scans are not memoised, the next scan retries
+            if future.cancelled() or future.exception() is not None:
+                return
+            self.labels[image_src] = future.result()
+
+            if self.labels_path is not None:
+                self.save()
+
+    def save(self):
+        tmp = f"{self.labels_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.labels, f, indent=2)
+        os.replace(tmp, self.labels_path)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
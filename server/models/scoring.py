@@ -0,0 +1,84 @@
+from typing import Callable
+import numpy as np
+import time
+
+
+class ScoreFilter():
+    """
+    Turns noisy single frame scores into suspicious/not suspicious
+    decisions per camera. Scores are smoothed with an EWMA, a camera
+    becomes suspicious once the smoothed score reaches enter and stays
+    so until it drops below exit. After being reported a camera is not
+    reported again for cooldown seconds.
+
+    State is kept in arrays indexed like the CameraRegistry columns, so
+    every camera is filtered at once.
+    """
+    def __init__(self, alpha: float = 0.5, enter: float = 0.6, exit: float = 0.4, cooldown: float = 30.0,
+                 raw_threshold: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        self.alpha = alpha                  # weight of the newest score
+        self.enter = enter
+        self.exit = exit
+        self.cooldown = cooldown
+        self.raw_threshold = raw_threshold  # single frame rule this filter replaces
+        self.clock = clock
+        self.smoothed = np.zeros(0, dtype=np.float64)
+        self.active = np.zeros(0, dtype=bool)
+        self.cooldown_until = np.zeros(0, dtype=np.float64)
+        self.spikes = np.zeros(0, dtype=bool)
+        self.reported = 0
+        self.suppressed = 0     # dispatches the single frame rule would have made
+
+    def _resize(self, count: int):
+        extra = count - len(self.smoothed)
+        if extra <= 0:
+            return
+
+        # new cameras start from a calm baseline, so a single high
+        # frame is not enough to make them suspicious
+        self.smoothed = np.concatenate([self.smoothed, np.zeros(extra)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.cooldown_until = np.concatenate([self.cooldown_until, np.zeros(extra)])
+        self.spikes = np.concatenate([self.spikes, np.zeros(extra, dtype=bool)])
+
+    def update(self, scores: np.ndarray, eligible: np.ndarray):
+        """
+        Feed the latest score of every camera, NaN for cameras without
+        one. Only cameras flagged in eligible are filtered, flag only
+        new readings: a score fed twice is smoothed in twice.
+        """
+        count = len(scores)
+        self._resize(count)
+
+        valid = eligible & ~np.isnan(scores)
+        latest = np.where(valid, scores, 0.0)
+        smoothed = self.smoothed[:count]
+        active = self.active[:count]
+        spikes = self.spikes[:count]
+
+        smoothed[valid] = self.alpha * latest[valid] + (1 - self.alpha) * smoothed[valid]
+        active[:] = np.where(valid, np.where(active, smoothed >= self.exit, smoothed >= self.enter), active)
+
+        # a raw score over the old threshold is what used to send the
+        # drone, count the spikes that ended without the camera ever
+        # becoming suspicious
+        raw = valid & (latest >= self.raw_threshold)
+        ended = valid & spikes & ~raw & ~active
+        self.suppressed += int(ended.sum())
+        spikes[:] = (spikes | raw) & ~active & ~ended
+
+    def reports(self) -> np.ndarray:
+        """Indices of suspicious cameras that are not cooling down, starts their cooldown"""
+        now = self.clock()
+        due = self.active & (self.cooldown_until <= now)
+        self.cooldown_until[due] = now + self.cooldown
+        self.reported += int(due.sum())
+
+        return np.flatnonzero(due)
+
+    def get_stats(self):
+        return {
+            'reported': self.reported,
+            'suppressed': self.suppressed,
+            'active': int(self.active.sum())
+        }
@@ -0,0 +1,131 @@
+from typing import Callable, Hashable
+import heapq
+import math
+
+
+class SpatialGrid():
+    """
+    Uniform grid over the horizontal (x, z) plane of the simulation.
+    Points are bucketed by cell so proximity queries only look at the
+    cells around the query point instead of every point.
+    """
+    def __init__(self, cell_size: float = 10.0):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], set[Hashable]] = {}
+        self.points: dict[Hashable, tuple[float, float, float]] = {}
+        # cell bounds ever used, only grown so they stay a safe limit
+        # for how far a ring search has to go
+        self.bounds: tuple[int, int, int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.points
+
+    def _cell(self, point: tuple[float, float, float]) -> tuple[int, int]:
+        return (math.floor(point[0] / self.cell_size), math.floor(point[2] / self.cell_size))
+
+    def insert(self, key: Hashable, point: tuple[float, float, float]):
+        """Insert a point, or move it if the key is already indexed"""
+        point = (float(point[0]), float(point[1]), float(point[2]))
+        previous = self.points.get(key)
+        if previous is not None:
+            if previous == point:
+                return
+
+            self.remove(key)
+
+        self.points[key] = point
+        cell = self._cell(point)
+        self.cells.setdefault(cell, set()).add(key)
+
+        if self.bounds is None:
+            self.bounds = (cell[0], cell[0], cell[1], cell[1])
+        else:
+            min_x, max_x, min_z, max_z = self.bounds
+            self.bounds = (min(min_x, cell[0]), max(max_x, cell[0]), min(min_z, cell[1]), max(max_z, cell[1]))
+
+    def remove(self, key: Hashable):
+        point = self.points.pop(key)
+        cell = self._cell(point)
+        bucket = self.cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self.cells[cell]
+
+    def nearest(self, point: tuple[float, float, float], predicate: Callable[[Hashable], bool] | None = None) -> Hashable | None:
+        """Closest key to point, optionally only among keys accepted by predicate"""
+        found = self.k_nearest(point, 1, predicate)
+        return found[0] if found else None
+
+    def k_nearest(self, point: tuple[float, float, float], k: int, predicate: Callable[[Hashable], bool] | None = None) -> list[Hashable]:
+        """Up to k keys closest to point, closest first"""
+        if not self.cells or k <= 0:
+            return []
+
+        cx, cz = self._cell(point)
+        min_x, max_x, min_z, max_z = self.bounds
+        max_ring = max(abs(cx - min_x), abs(cx - max_x), abs(cz - min_z), abs(cz - max_z))
+        # rings closer than the bounds are empty, start at the first
+        # one that reaches them (0 when the point is inside)
+        min_ring = max(min_x - cx, cx - max_x, min_z - cz, cz - max_z, 0)
+
+        # max-heap of the best k as (-dist, counter, key)
+        best: list[tuple[float, int, Hashable]] = []
+        counter = 0
+        for ring in range(min_ring, max_ring + 1):
+            for cell in self._ring(cx, cz, ring):
+                for key in self.cells.get(cell, ()):
+                    if predicate is not None and not predicate(key):
+                        continue
+
+                    dist = math.dist(point, self.points[key])
+                    counter += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, counter, key))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, counter, key))
+
+            # anything in the next ring is at least ring * cell_size away
+            if len(best) == k and -best[0][0] <= ring * self.cell_size:
+                break
+
+        return [key for _, _, key in sorted(best, key=lambda entry: -entry[0])]
+
+    def within(self, point: tuple[float, float, float], radius: float) -> list[Hashable]:
+        """Every key at most radius away from point"""
+        if not self.cells:
+            return []
+
+        cx, cz = self._cell(point)
+        rings = math.ceil(radius / self.cell_size)
+        min_x, max_x, min_z, max_z = self.bounds
+
+        found = []
+        for x in range(max(cx - rings, min_x), min(cx + rings, max_x) + 1):
+            for z in range(max(cz - rings, min_z), min(cz + rings, max_z) + 1):
+                for key in self.cells.get((x, z), ()):
+                    if math.dist(point, self.points[key]) <= radius:
+                        found.append(key)
+
+        return found
+
+    def _ring(self, cx: int, cz: int, ring: int):
+        """Cells of the square ring around (cx, cz), clipped to the bounds"""
+        if ring == 0:
+            yield (cx, cz)
+            return
+
+        min_x, max_x, min_z, max_z = self.bounds
+        xs = range(max(cx - ring, min_x), min(cx + ring, max_x) + 1)
+        for z in (cz - ring, cz + ring):
+            if min_z <= z <= max_z:
+                for x in xs:
+                    yield (x, z)
+
+        zs = range(max(cz - ring + 1, min_z), min(cz + ring - 1, max_z) + 1)
+        for x in (cx - ring, cx + ring):
+            if min_x <= x <= max_x:
+                for z in zs:
+                    yield (x, z)
@@ -0,0 +1,135 @@
+"""
+Render reports for runs saved by the simulation, outside the agent process.
+
+    python -m server.report runs/run-20250101-120000.npz
+    python -m server.report runs/*.npz --out reports
+
+Every run gets its own folder with the response time and alarm accuracy
+plots. Plots newer than their run file are kept (use --force to redraw).
+With more than one run, a comparison table and plot are produced too.
+"""
+import argparse
+import os
+
+import numpy as np
+
+from .models.runlog import RESPONSE_WINDOW, load_run, match_alarms, summarize
+
+
+def run_summary(run: dict[str, np.ndarray], window: float) -> dict:
+    summary = summarize(run['alarms'], run['activities'], window)
+
+    # dispatch -> resolution of the incidents the guard closed
+    handled = run['incident_resolved_at'] - run['incident_dispatched_at']
+    handled = handled[~np.isnan(handled)]
+    summary['total_suspicious_activities'] = len(run['activities'])
+    summary['incidents'] = len(run['incident_cameras'])
+    summary['average_investigation_time'] = float(handled.mean()) if len(handled) else 0
+    return summary
+
+
+def render_run(run: dict[str, np.ndarray], out_dir: str, window: float):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    response, false_positive = match_alarms(run['alarms'], run['activities'], window)
+    response = response[~false_positive]
+
+    # Create response time graph
+    plt.figure(figsize=(12, 6))
+    if len(response):
+        plt.plot(np.arange(len(response)), response, 'b-', label='Response Time')
+        plt.axhline(y=response.mean(), color='r', linestyle='--', label=f'Average: {response.mean():.2f}s')
+
+    plt.xlabel("Alarm Number")
+    plt.ylabel("Response Time (seconds)")
+    plt.title("Alarm Response Times")
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(os.path.join(out_dir, "response_times.png"))
+    plt.close()
+
+    # Create false positives graph
+    plt.figure(figsize=(8, 6))
+    labels = ['Valid Alarms', 'False Positives']
+    sizes = [len(response), int(false_positive.sum())]
+    colors = ['lightgreen', 'lightcoral']
+
+    if sum(sizes):
+        plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%')
+    plt.title("Alarm Accuracy Analysis")
+    plt.savefig(os.path.join(out_dir, "false_positives.png"))
+    plt.close()
+
+
+def render_comparison(runs: dict[str, dict[str, np.ndarray]], out_path: str, window: float):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    responses = []
+    for run in runs.values():
+        response, false_positive = match_alarms(run['alarms'], run['activities'], window)
+        responses.append(response[~false_positive])
+
+    plt.figure(figsize=(max(6, 1.5 * len(runs)), 6))
+    plt.boxplot(responses)
+    plt.xticks(range(1, len(runs) + 1), list(runs), rotation=30, ha='right')
+    plt.ylabel("Response Time (seconds)")
+    plt.title("Response Times by Run")
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def is_fresh(outputs: list[str], source: str) -> bool:
+    """True if every output exists and is newer than source"""
+    source_time = os.path.getmtime(source)
+    return all(os.path.exists(path) and os.path.getmtime(path) >= source_time for path in outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("runs", nargs="+", help=".npz files written by the simulation")
+    parser.add_argument("--out", default="reports", help="folder for the rendered plots")
+    parser.add_argument("--window", type=float, default=RESPONSE_WINDOW, help="max seconds between activity and alarm")
+    parser.add_argument("--no-plots", action="store_true", help="only print the summaries")
+    parser.add_argument("--force", action="store_true", help="redraw plots even if up to date")
+    args = parser.parse_args()
+
+    runs = {}
+    for path in args.runs:
+        name = os.path.splitext(os.path.basename(path))[0]
+        runs[name] = load_run(path)
+
+        if args.no_plots:
+            continue
+
+        out_dir = os.path.join(args.out, name)
+        outputs = [os.path.join(out_dir, "response_times.png"), os.path.join(out_dir, "false_positives.png")]
+        if not args.force and is_fresh(outputs, path):
+            print(f"[REPORT] {name} is up to date")
+            continue
+
+        os.makedirs(out_dir, exist_ok=True)
+        render_run(runs[name], out_dir, args.window)
+        print(f"[REPORT] {name} rendered to {out_dir}")
+
+    print(f"\n{'run':<28} {'alarms':>7} {'valid':>6} {'fp rate':>8} {'avg resp s':>11} {'activities':>11} {'incidents':>10} {'avg inv s':>10}")
+    for name, run in runs.items():
+        s = run_summary(run, args.window)
+        print(f"{name:<28} {s['total_alarms']:>7} {s['valid_alarms']:>6} {s['false_positive_rate']*100:>7.1f}% "
+              f"{s['average_response_time']:>11.2f} {s['total_suspicious_activities']:>11} {s['incidents']:>10} "
+              f"{s['average_investigation_time']:>10.2f}")
+
+    if len(runs) > 1 and not args.no_plots:
+        os.makedirs(args.out, exist_ok=True)
+        out_path = os.path.join(args.out, "comparison.png")
+        render_comparison(runs, out_path, args.window)
+        print(f"\n[REPORT] Comparison rendered to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Monte-Carlo sweeps of the warehouse simulation, headless: no Unity
+client, events dropped (or counted), nothing printed, and object labels
+taken from the image file names instead of the vision model. Every
+(floor size, agent count) pair is run for --seeds seeds on a process
+pool and summarised in a table.
+
+Needs the warehouse models (models/storage.py, models/object.py,
+models/eventemmiter.py) and the object images in server/objects, which
+are not part of this repository. Run from the root directory, like the
+simulation itself:
+
+    python server/sweep.py --sizes 20 40 --agents 2 4 8 --seeds 20
+    python server/sweep.py --cooperative --csv sweep.csv
+    python server/sweep.py --regressions
+"""
+import argparse
+import csv
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from example import Warehouse
+    from models.storage import Storage
+except ModuleNotFoundError as e:
+    raise SystemExit(f"sweep: the warehouse simulation needs {e.name}, which is not in this checkout") from e
+from models.headless import NullEmitter
+from models.scanner import ObjectScanner
+
+
+# cooperative runs that once never got sorted, as (floor size, agents,
+# objects, storages, seed). --regressions runs them on a single thread,
+# so they play out the same every time
+REGRESSIONS = [
+    # idle agents parked around the free side of a storage
+    (20, 16, 8, 4, 3),
+    # an idle agent stepping aside back and forth on the way to a storage
+    (20, 16, 8, 4, 5),
+]
+
+
+def run_once(size: int, agents: int, objects: int, storages: int, seed: int, max_steps: int,
+             cooperative: bool, workers: int) -> dict:
+    random.seed(seed)
+
+    # the label of every object is its file name, no vision requests
+    scanner = ObjectScanner()
+    scanner.labels = {src: src.split(".")[0] for src in os.listdir(scanner.objects_dir)}
+
+    warehouse = Warehouse((size, size, 1), NullEmitter(), scanner=scanner, workers=workers,
+                          cooperative=cooperative, headless=True)
+    # storages along the far wall, each big enough for every object so
+    # no class ever runs out of room
+    for i in range(min(storages, size // 2)):
+        warehouse.attach_storage(Storage((i * 2, size - 1, 0), objects))
+    warehouse.seed_objects(objects)
+    warehouse.seed_agents(agents)
+
+    start = time.perf_counter()
+    while warehouse.step_n < max_steps and not warehouse.is_sorted():
+        warehouse.step()
+    elapsed = time.perf_counter() - start
+    warehouse.close()
+
+    return {
+        'sorted': warehouse.is_sorted(),
+        'steps': warehouse.step_n,
+        'moves': sum(agent.move_count for agent in warehouse.agents),
+        'replans': sum(agent.replans for agent in warehouse.agents),
+        'conflicts': warehouse.conflicts,
+        'steps_per_second': warehouse.step_n / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def summarise(results: list[dict]) -> dict:
+    steps = np.array([r['steps'] for r in results if r['sorted']])
+    return {
+        'runs': len(results),
+        'sorted': sum(r['sorted'] for r in results) / len(results),
+        'steps_mean': float(steps.mean()) if len(steps) else float('nan'),
+        'steps_p95': float(np.percentile(steps, 95)) if len(steps) else float('nan'),
+        'moves': float(np.mean([r['moves'] for r in results])),
+        'replans': float(np.mean([r['replans'] for r in results])),
+        'conflicts': float(np.mean([r['conflicts'] for r in results])),
+        'steps_per_second': float(np.mean([r['steps_per_second'] for r in results])),
+    }
+
+
+def run_regressions(max_steps: int) -> bool:
+    """Run every REGRESSIONS case, True if they all got sorted"""
+    passed = True
+    for size, agents, objects, storages, seed in REGRESSIONS:
+        result = run_once(size, agents, objects, storages, seed, max_steps, True, 0)
+        status = "sorted" if result['sorted'] else "NOT SORTED"
+        print(f"{size}x{size} agents={agents} objects={objects} storages={storages} seed={seed}: "
+              f"{status} in {result['steps']} steps")
+        passed = passed and result['sorted']
+
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 40])
+    parser.add_argument("--agents", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--objects", type=float, default=0.02, help="objects per floor cell")
+    parser.add_argument("--storages", type=int, default=6)
+    parser.add_argument("--seeds", type=int, default=10)
+    parser.add_argument("--max-steps", type=int, default=2000, help="runs not sorted by then count as unsorted")
+    parser.add_argument("--cooperative", action="store_true", help="plan over space-time reservations")
+    parser.add_argument("--workers", type=int, default=0, help="planning threads per warehouse")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="warehouses run at once")
+    parser.add_argument("--csv", help="also write the summary table here")
+    parser.add_argument("--regressions", action="store_true", help="only run the REGRESSIONS cases, fail if any is not sorted")
+    args = parser.parse_args()
+
+    if args.regressions:
+        raise SystemExit(0 if run_regressions(args.max_steps) else 1)
+
+    configs = [(size, agents) for size in args.sizes for agents in args.agents]
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            (size, agents): [
+                pool.submit(run_once, size, agents, max(1, int(size * size * args.objects)), args.storages,
+                            seed, args.max_steps, args.cooperative, args.workers)
+                for seed in range(args.seeds)
+            ]
+            for size, agents in configs
+        }
+        rows = []
+        for size, agents in configs:
+            summary = summarise([future.result() for future in futures[(size, agents)]])
+            rows.append({'size': size, 'agents': agents, **summary})
+
+    print(f"{'floor':>9} {'agents':>7} {'runs':>5} {'sorted':>7} {'steps':>8} {'p95':>8} {'moves':>8} "
+          f"{'replans':>8} {'conflicts':>10} {'steps/s':>9}")
+    for row in rows:
+        floor = f"{row['size']}x{row['size']}"
+        print(f"{floor:>9} {row['agents']:>7} {row['runs']:>5} {row['sorted']:>7.0%} "
+              f"{row['steps_mean']:>8.1f} {row['steps_p95']:>8.1f} {row['moves']:>8.1f} {row['replans']:>8.1f} "
+              f"{row['conflicts']:>10.1f} {row['steps_per_second']:>9.0f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
 from .models.ee import EventEmitter
+from .models.frames import FrameDecoder, FrameFeatures
+from .models.registry import CameraRegistry
+from .models.capture import CameraFrame, decode_capture
+from .models.spatial import SpatialGrid
+from .models.incidents import Incident, IncidentManager
+from .models.motion import MotionGate
+from .models.scoring import ScoreFilter
+from .models.patrol import PatrolPlanner
+from .models.eta import MoveTimeModel
+from .models.flow import FlowController
+from .models.metrics import Metrics, MetricsServer
+from .models.runlog import save_run, summarize
 from enum import Enum
-from dotenv import load_dotenv
-from openai import OpenAI
+from typing import TYPE_CHECKING
 import hashlib
 import random
 import argparse
@@ -10,11 +21,16 @@ import datetime
 import time
 import os
 import base64
-from PIL import Image
-import imagehash
-import io
+import math
+import numpy as np
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+if TYPE_CHECKING:
+    # vision dependencies are imported on first use, see DroneAgent.oai
+    import imagehash
+    from openai import OpenAI
+
 def log(func):
     def wrapper(*args, **kwargs):
         print(f"Function {func.__name__} called with args: {args}, kwargs: {kwargs}")
@@ -25,24 +41,30 @@ def log(func):
 class Events(Enum):
     # CAMERA_CAPTURE event is triggered when a new
     # image is captured by a camera. 
-    # data: "camera_id,b64img"
+    # data: "camera_id,x,y,z,xrot,yrot,zrot,b64img"
     CAMERA_CAPTURE = "camera_capture"
 
     # DRONE_CAMERA_CAPTURE event is an alias for
     # CAMERA_CAPTURE event, but for the drone camera
-    # data: "camera_id,b64img"
+    # data: "camera_id,x,y,z,xrot,yrot,zrot,b64img"
     DRONE_CAMERA_CAPTURE = "drone_camera_capture"
 
     # DRONE_STATUS_UPDATE event is triggered when
     # an activity is completed by the drone
-    # data: "status" -> "BUSY" or "IDLE"
+    # data: "drone_id,status" -> status is "BUSY" or "IDLE"
+    # older clients send only "status", applied to every drone
     DRONE_STATUS_UPDATE = "drone_status_update"
 
-    # MOVE_TO event is sent when the drone is requested
+    # MOVE_TO event is sent when a drone is requested
     # to move to a specific camera location
-    # data: camera_id
+    # data: "x,y,z,xrot,yrot,zrot,camera_id,drone_id"
     MOVE_TO = "move_to"
 
+    # CAPTURE_CREDITS event is sent to grant fixed cameras
+    # the frames they may send and the interval between them
+    # data: "camera_id,credits,interval" -> camera_id "*" is every camera
+    CAPTURE_CREDITS = "capture_credits"
+
     # ALARM event is triggered when an alarm is triggered
     # by the drone,
     # data: "time"
@@ -74,34 +96,174 @@ class DroneMode(Enum):
 class DroneState(Enum):
     BUSY = "BUSY"
     IDLE = "IDLE"
+
+
+class Drone():
+    """
+    A single drone of the fleet, keyed by its Unity object name. The
+    drone flies the moves it is sent one after the other, and reports
+    each of them as IDLE when it reaches the camera, BUSY when it leaves
+    it and IDLE again once it is back on its route. The moves are
+    followed through that stream, so a status is never mistaken for
+    the end of another move.
+    """
+    def __init__(self, drone_id: str):
+        self.id = drone_id
+        self.mode = DroneMode.AUTONOMOUS
+        self.status = DroneState.IDLE
+        # the drone camera captures are sent with the drone name
+        # as camera id, so both share the same key
+        self.camera_id = drone_id
+        self.moved_at = time.monotonic()    # last move_to, or when the drone was first seen
+        self.moves: deque[tuple[str, float | None]] = deque()  # (camera id, distance) of the moves not finished
+        self.moves_sent = 0                 # move ids are 1, 2, ... in the order they were sent
+        self.moves_reached = 0              # id of the last move whose camera was reached
+        self.move_started = self.moved_at   # when the drone set off on moves[0]
+        self.paused = False                 # at the camera of moves[0]
+        self.returning = False              # on the way back to the route from moves[0]
+
+    def is_available(self) -> bool:
+        return self.mode == DroneMode.AUTONOMOUS and self.status == DroneState.IDLE
+
+    def moved(self, camera_id: str, distance: float | None) -> int:
+        """A move_to was sent, returns its move id"""
+        now = time.monotonic()
+        if not self.moves:
+            self.move_started = now
+        self.moves.append((camera_id, distance))
+        self.moves_sent += 1
+        self.moved_at = now
+        self.status = DroneState.BUSY
+        return self.moves_sent
+
+    def status_changed(self, status: DroneState) -> tuple[float | None, float] | None:
+        """Apply a status update, returns (distance, seconds) of the move it completed, if any"""
+        self.status = status
+        if not self.moves:
+            return None
+
+        now = time.monotonic()
+        if status == DroneState.IDLE and not self.paused and not self.returning:
+            # reached the camera of the first move
+            self.paused = True
+            self.moves_reached += 1
+            _, distance = self.moves[0]
+            return distance, now - self.move_started
+
+        if status == DroneState.BUSY and self.paused:
+            self.paused = False
+            self.returning = True
+        elif status == DroneState.IDLE and self.returning:
+            # back on the route, the next move starts right away
+            self.returning = False
+            self.moves.popleft()
+            self.move_started = now
+            if self.moves:
+                self.status = DroneState.BUSY
+
+        return None
+
+
+class DroneFleet():
+    """Pool of drones keyed by id, with a spatial index of their positions"""
+    def __init__(self, verbose: bool = True):
+        self.drones: dict[str, Drone] = {}
+        self.positions = SpatialGrid()
+        self.verbose = verbose
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def __len__(self) -> int:
+        return len(self.drones)
+
+    def __iter__(self):
+        return iter(self.drones.values())
+
+    def __contains__(self, drone_id: str) -> bool:
+        return drone_id in self.drones
+
+    def get(self, drone_id: str) -> Drone:
+        return self.drones[drone_id]
+
+    def register(self, drone_id: str) -> Drone:
+        if drone_id not in self.drones:
+            self.log(f"[DEBUG] DroneFleet.register() - New drone {drone_id}")
+            self.drones[drone_id] = Drone(drone_id)
+
+        return self.drones[drone_id]
+
+    def update_position(self, drone_id: str, pose: tuple[float, ...]):
+        self.register(drone_id)
+        self.positions.insert(drone_id, pose[:3])
+
+    def distance_to(self, drone_id: str, pose: tuple[float, ...]) -> float | None:
+        position = self.positions.points.get(drone_id)
+        if position is None:
+            return None
+
+        return math.dist(position, pose[:3])
+
+    def nearest_available(self, pose: tuple[float, ...]) -> Drone | None:
+        """Closest drone that is idle and not under guard control"""
+        if not any(drone.is_available() for drone in self.drones.values()):
+            return None
+
+        drone_id = self.positions.nearest(pose[:3], lambda d: self.drones[d].is_available())
+        if drone_id is not None:
+            return self.drones[drone_id]
+
+        # drones we have no position for yet are still better than none
+        for drone in self.drones.values():
+            if drone.is_available():
+                return drone
+
+        return None
     
 
 class DroneAgent():
-    def __init__(self, serverconn):
-        self.analisis_scores = {}
+    def __init__(self, serverconn, motion_gate: MotionGate | None = None, score_filter: ScoreFilter | None = None,
+                 metrics: Metrics | None = None, flow: FlowController | None = None):
         self.serverconn = serverconn
-        self.images = {}
-        self.camera_locations = {}
-        self.score_cache = {}
-        self.image_hashes = {}  # Store perceptual hashes of images
+        self.metrics = metrics or Metrics()
+        self.cameras = CameraRegistry()  # Poses, frames, hashes and scores per camera
         self.hash_cutoff = 0    # Maximum bits that could be different between hashes
+        self.motion_gate = motion_gate or MotionGate()  # Skips scoring of static frames
+        self.score_filter = score_filter or ScoreFilter()  # Smoothing, hysteresis and cooldown per camera
+        self.patrol = PatrolPlanner()  # Tour over the fixed cameras for idle drones
+        self.patrol_interval = 30.0    # Seconds a drone stays on its own route between patrol moves
+        self.overlap_radius = 5.0      # Cameras closer than this see the same scene
+        self.move_times = MoveTimeModel()  # Learned from observed BUSY -> IDLE intervals
+        self.flow = flow or FlowController()  # Capture credits for the fixed cameras
+        self.capture_backlog = 0    # fixed camera frames queued at the start of the step
         self.messages = []
-        self.mode = DroneMode.AUTONOMOUS
-        self.status = DroneState.IDLE
-        self.drone_camera = None
+        self.fleet = DroneFleet()
         self.guard: 'GuardAgent' | None = None
-        self.oai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.thread_pool = ThreadPoolExecutor(max_workers=10)  # Increased to 10 workers for more parallelism
+        self._oai: 'OpenAI' | None = None   # built on the first vision request
+        self.thread_pool = ThreadPoolExecutor(max_workers=10)  # Threads are only started as work is submitted
+        self.frame_decoder = FrameDecoder()  # Process pool for CPU bound decode/hash work
         print("[DEBUG] DroneAgent initialized")
 
-    def get_image_hash(self, b64img: str) -> imagehash.ImageHash:
+    @property
+    def oai(self) -> 'OpenAI':
+        if self._oai is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+
+            load_dotenv()
+            self._oai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._oai
+
+    def get_image_hash(self, b64img: str | memoryview) -> 'imagehash.ImageHash':
         """Calculate perceptual hash of a base64 encoded image."""
+        features = self.get_image_features(self.frame_decoder.submit(b64img))
+        return features.hash if features is not None else None
+
+    def get_image_features(self, frame_future) -> FrameFeatures | None:
+        """Wait for a frame submitted to the decoder and return its features."""
         try:
-            # Convert base64 to image
-            img_data = base64.b64decode(b64img)
-            img = Image.open(io.BytesIO(img_data))
-            # Calculate perceptual hash
-            return imagehash.average_hash(img)
+            return frame_future.result()
         except Exception as e:
             print(f"[ERROR] Failed to calculate image hash: {e}")
             return None
@@ -109,70 +271,140 @@ class DroneAgent():
     def step(self):
         print("[DEBUG] DroneAgent.step() - Starting execution cycle")
         self.update_status()
+        self.handle_control_messages()
+
+        # fixed cameras keep being watched while drones are
+        # moving or under guard control
+        step_started = time.time()
+        self.handle_camera_events()
+        self.analyze_images()
+
+        # drone cameras only confirm, they never start an incident.
+        # Scores persist between steps and cached ones are set again,
+        # only what the model scored this step is a new reading
+        count = len(self.cameras)
+        fresh = self.cameras.scored_since(step_started)
+        self.score_filter.update(self.cameras.scores[:count], fresh & ~self.cameras.is_drone[:count])
+        for index in self.score_filter.reports():
+            self.report_suspicious_activity(self.cameras.records[index].camera_id)
+
+        self.grant_capture_credits()
+        self.patrol_idle_drones()
+
+
+    def grant_capture_credits(self):
+        """Let the fixed cameras send as many frames as the vision budget allows"""
+        smoothed = self.score_filter.smoothed
+        scores = {
+            record.camera_id: float(smoothed[record.index])
+            for record in self.cameras
+            if not record.is_drone and record.index < len(smoothed)
+        }
+        for camera_id, credits, interval in self.flow.grants(scores, self.capture_backlog):
+            self.serverconn.send_event(Events.CAPTURE_CREDITS.value, [camera_id, str(credits), f"{interval:.3f}"])
+
+
+    def move_to(self, camera_id, drone_id) -> float | None:
+        """Send a drone to a camera, returns the predicted travel time in seconds if known"""
+        pose = self.cameras.pose(camera_id)
+        self.serverconn.send_event(Events.MOVE_TO.value, [str(v) for v in pose] + [camera_id, drone_id])
+        drone = self.fleet.get(drone_id)
+        distance = self.fleet.distance_to(drone_id, pose)
+        drone.moved(camera_id, distance)
+
+        if distance is None:
+            return None
+
+        return self.move_times.predict(distance)
 
-        if self.status == DroneState.BUSY:
-            print("[DEBUG] DroneAgent.step() - Drone is busy, skipping execution cycle")
+
+    def patrol_idle_drones(self):
+        # incidents waiting for a drone come first
+        if self.guard is not None and self.guard.incidents.queued():
             return
 
-        if self.mode == DroneMode.AUTONOMOUS:
-            self.handle_camera_events()
-            self.analyze_images()
+        now = time.monotonic()
+        for drone in self.fleet:
+            if not drone.is_available() or now - drone.moved_at < self.patrol_interval:
+                continue
 
-            riskiest_camera = None
-            for camera_id, score in self.analisis_scores.items():
-                if riskiest_camera is None or score > self.analisis_scores[riskiest_camera]:
-                    riskiest_camera = camera_id
+            if self.patrol.lap_completed():
+                self.patrol.replan(self.patrol_weights())
 
-            if riskiest_camera is not None and riskiest_camera in self.analisis_scores and self.analisis_scores[riskiest_camera] >= 0.5:
-                self.report_suspicious_activity(riskiest_camera)
+            camera_id = self.patrol.next_waypoint()
+            if camera_id is None:
+                return
 
-            self.handle_connection_request()
+            # the drone camera already covers that stop, go on to the next
+            if camera_id == self.overlapped_camera(drone.id) and len(self.patrol) > 1:
+                if self.patrol.lap_completed():
+                    self.patrol.replan(self.patrol_weights())
+                camera_id = self.patrol.next_waypoint()
 
-        if self.mode == DroneMode.CONTROLLED:
-            self.handle_connection_close()
+            print(f"[DEBUG] DroneAgent.patrol_idle_drones() - Sending drone {drone.id} to patrol camera {camera_id}")
+            self.move_to(camera_id, drone.id)
 
 
-    def move_to(self, camera_id):
-        x, y, z, xrot, yrot, zrot = self.camera_locations[camera_id]
-        self.serverconn.send_event(Events.MOVE_TO.value, [x, y, z, xrot, yrot, zrot, camera_id])
-        self.status = DroneState.BUSY
+    def overlapped_camera(self, drone_id: str) -> str | None:
+        """Fixed camera whose scene the drone camera is in, None if it is away from all of them"""
+        position = self.fleet.positions.points.get(drone_id)
+        if position is None:
+            return None
+
+        # drones fly above the cameras, only the ground distance counts
+        nearest = self.cameras.nearest((position[0], 0.0, position[2]))
+        if not nearest:
+            return None
+
+        pose = self.cameras.pose(nearest[0])
+        if math.dist((position[0], position[2]), (pose[0], pose[2])) > self.overlap_radius:
+            return None
+
+        return nearest[0]
+
+
+    def patrol_weights(self) -> np.ndarray:
+        """Recent smoothed score of every patrolled camera, in patrol order"""
+        indices = np.array([self.cameras.ids[camera_id] for camera_id in self.patrol.camera_ids], dtype=np.intp)
+        smoothed = self.score_filter.smoothed
+        weights = np.zeros(len(indices), dtype=np.float64)
+        known = indices < len(smoothed)
+        weights[known] = smoothed[indices[known]]
+        return weights
 
 
     def update_status(self):
         while self.serverconn.check_event(Events.DRONE_STATUS_UPDATE.value):
             event = self.serverconn.get_event(Events.DRONE_STATUS_UPDATE.value)
-            if event == "IDLE":
-                print("[DEBUG] DroneAgent.update_status() - Changing status to IDLE")
-                self.status = DroneState.IDLE
-            elif event == "BUSY":
-                print("[DEBUG] DroneAgent.update_status() - Changing status to BUSY")
-                self.status = DroneState.BUSY
-            else:
+            # newer clients prefix the status with the drone id
+            drone_id, _, status = event.rpartition(",")
+
+            if status not in ("IDLE", "BUSY"):
                 raise Exception(f"Unknown event: {event}")
 
+            drones = [self.fleet.register(drone_id)] if drone_id else list(self.fleet)
+            for drone in drones:
+                print(f"[DEBUG] DroneAgent.update_status() - Changing status of {drone.id} to {status}")
+                reached = drone.status_changed(DroneState(status))
+                if reached is not None and reached[0] is not None:
+                    # a move we requested is over, learn how long it took
+                    self.move_times.observe(*reached)
+
 
     def message_box_append(self, message):
         self.messages.append(message)
 
 
-    def handle_connection_request(self):
-        # Check if there is a connection request
+    def handle_control_messages(self):
+        # Control requests and releases carry the id of the drone
         while self.messages:
             msg = self.messages.pop(0)
             if msg.code == MessageCode.CONTROL_REQUEST:
-                print("[DEBUG] DroneAgent.handle_connection_request() - Control request received - switching to CONTROLLED mode")
-                self.mode = DroneMode.CONTROLLED
-            else:
-                print("[WARN]: Unknown message code:", msg.code)
-
-
-    def handle_connection_close(self):
-        # Check if there is a connection close event
-        while self.messages:
-            msg = self.messages.pop(0)
-            if msg.code == MessageCode.CONTROL_ENDED:
-                print("[DEBUG] DroneAgent.handle_connection_close() - Control ended received - switching to AUTONOMOUS mode")
-                self.mode = DroneMode.AUTONOMOUS
+                print(f"[DEBUG] DroneAgent.handle_control_messages() - Control request received - switching {msg.message} to CONTROLLED mode")
+                self.fleet.get(msg.message).mode = DroneMode.CONTROLLED
+            elif msg.code == MessageCode.CONTROL_ENDED:
+                print(f"[DEBUG] DroneAgent.handle_control_messages() - Control ended received - switching {msg.message} to AUTONOMOUS mode")
+                self.fleet.get(msg.message).mode = DroneMode.AUTONOMOUS
             else:
                 print("[WARN]: Unknown message code:", msg.code)
 
@@ -181,69 +413,110 @@ class DroneAgent():
         print("[DEBUG] DroneAgent.handle_camera_events() - Handling camera events")
         # This method should load the latest images from
         # the serverconn, so we can run vision on them
+        queue = self.serverconn.event_queues.get(Events.CAMERA_CAPTURE.value)
+        self.capture_backlog = queue.qsize() if queue is not None else 0
+
         while self.serverconn.check_event(Events.CAMERA_CAPTURE.value):
-            event = self.serverconn.get_event(Events.CAMERA_CAPTURE.value)
-            camera_id, x, y, z, xrot, yrot, zrot, b64img = event.split(",")
-            self.camera_locations[camera_id] = (x, y, z, xrot, yrot, zrot)
-            self.images[camera_id] = b64img
+            frame = decode_capture(self.serverconn.get_event(Events.CAMERA_CAPTURE.value))
+            self.flow.received(frame.camera_id)
+            if frame.camera_id not in self.cameras:
+                self.patrol.add(frame.camera_id, frame.pose)
+            self.cameras.update(frame.camera_id, frame.pose, frame)
 
         while self.serverconn.check_event(Events.DRONE_CAMERA_CAPTURE.value):
-            event = self.serverconn.get_event(Events.DRONE_CAMERA_CAPTURE.value)
-            camera_id, x, y, z, xrot, yrot, zrot, b64img = event.split(",")
-            self.camera_locations[camera_id] = (x, y, z, xrot, yrot, zrot)
-            self.images[camera_id] = b64img
-            self.drone_camera = camera_id
+            frame = decode_capture(self.serverconn.get_event(Events.DRONE_CAMERA_CAPTURE.value))
+            self.cameras.update(frame.camera_id, frame.pose, frame, is_drone=True)
+            self.fleet.update_position(frame.camera_id, frame.pose)
             
   
         
-    def analyze_single_image(self, camera_id: str, image: str) -> tuple[str, float]:
+    def analyze_single_image(self, camera_id: str, image: CameraFrame, frame_future=None) -> tuple[str, float]:
         """Analyze a single image and return its camera_id and score."""
-        current_hash = self.get_image_hash(image)
-        if current_hash is None:
+        if frame_future is None:
+            frame_future = self.frame_decoder.submit(image.buffer)
+
+        features = self.get_image_features(frame_future)
+        if features is None:
             print(f"[ERROR] Could not calculate hash for camera {camera_id}, forcing analysis")
-            score = self.analyze_picture(image)
+            score = self.analyze_picture(image.b64)
+            self.cameras.mark_scored(camera_id)
             return camera_id, score
 
+        current_hash = features.hash
+        record = self.cameras.get(camera_id)
+        record.thumbnail = features.thumbnail
+
+        # Static scenes keep the score they already have
+        moving = self.motion_gate.check(camera_id, features.thumbnail)
+        if not moving and record.cached_score is not None:
+            print(f"[DEBUG] No motion for camera {camera_id} - Using cached score")
+            self.metrics.inc("vision_cache_requests_total", result="static")
+            return camera_id, record.cached_score
+
         # Check if we have a previous hash for this camera
-        if camera_id in self.image_hashes and camera_id in self.score_cache:
-            prev_hash = self.image_hashes[camera_id]
+        if record.image_hash is not None and record.cached_score is not None:
+            prev_hash = record.image_hash
             hash_diff = current_hash - prev_hash
             
             if hash_diff < self.hash_cutoff:
                 print(f"[DEBUG] Images similar for camera {camera_id} (diff: {hash_diff}) - Using cached score")
-                return camera_id, self.score_cache[camera_id]
+                self.metrics.inc("vision_cache_requests_total", result="hit")
+                return camera_id, record.cached_score
             else:
                 print(f"[DEBUG] Significant change detected for camera {camera_id} (diff: {hash_diff})")
 
         # If we reach here, we need to analyze the image
         print(f"[DEBUG] Analyzing new image from camera {camera_id}")
-        score = self.analyze_picture(image)
+        self.metrics.inc("vision_cache_requests_total", result="miss")
+        score = self.analyze_picture(image.b64)
+        self.cameras.mark_scored(camera_id)
         
         # Update caches
-        self.score_cache[camera_id] = score
-        self.image_hashes[camera_id] = current_hash
+        record.cached_score = score
+        record.image_hash = current_hash
         
         return camera_id, score
 
+    def analyze_camera(self, camera_id: str):
+        """Analyze the latest frame of a single camera in the background, returns a future of its score"""
+        if camera_id not in self.cameras or self.cameras.get(camera_id).image is None:
+            return None
+
+        image = self.cameras.get(camera_id).image
+
+        def analyze():
+            _, score = self.analyze_single_image(camera_id, image)
+            self.cameras.set_score(camera_id, score)
+            return score
+
+        return self.thread_pool.submit(analyze)
+
     def analyze_images(self):
         print("[DEBUG] DroneAgent.analyze_images() - Analyzing images in parallel")
+
+        # Hand every frame to the decoder processes first, so decoding
+        # and hashing runs on all cores while the threads wait on the API
+        frame_futures = {
+            record.camera_id: self.frame_decoder.submit(record.image.buffer)
+            for record in self.cameras if record.image is not None
+        }
         
         # Submit all image analysis tasks to the thread pool
         future_to_camera = {
-            self.thread_pool.submit(self.analyze_single_image, camera_id, image): camera_id
-            for camera_id, image in self.images.items()
+            self.thread_pool.submit(self.analyze_single_image, camera_id, self.cameras.get(camera_id).image, frame_future): camera_id
+            for camera_id, frame_future in frame_futures.items()
         }
 
         # Collect results as they complete
         for future in as_completed(future_to_camera):
             try:
                 camera_id, score = future.result()
-                self.analisis_scores[camera_id] = score
+                self.cameras.set_score(camera_id, score)
             except Exception as e:
                 camera_id = future_to_camera[future]
                 print(f"[ERROR] Analysis failed for camera {camera_id}: {str(e)}")
                 # Set a default score or handle the error as needed
-                self.analisis_scores[camera_id] = 0.0
+                self.cameras.set_score(camera_id, 0.0)
 
     def analyze_picture(self, b64img: str) -> float:
         start_time = time.time()
@@ -273,6 +546,7 @@ class DroneAgent():
 
         print("[DEBUG] DroneAgent.analyze_picture() - Result:", response.choices[0].message.content)
         print("[DEBUG] DroneAgent.analyze_picture() - Time taken:", time.time() - start_time)
+        self.metrics.observe("vision_latency_seconds", time.time() - start_time)
         
         return float(response.choices[0].message.content)
 
@@ -301,11 +575,11 @@ class GuardState(Enum):
 
 
 class GuardAgent():
-    def __init__(self, drone: DroneAgent, serverconn):
+    def __init__(self, drone: DroneAgent, serverconn, max_parallel: int | None = None):
         self.messages = []
         self.state = GuardState.IDLE
-        self.suspicious_camera = None
-        self.moved_drone = False
+        # open incidents, at most max_parallel investigated at once
+        self.incidents = IncidentManager(max_parallel=max_parallel)
         self.serverconn = serverconn
 
         self.drone = drone
@@ -315,45 +589,107 @@ class GuardAgent():
 
     def step(self):
         print("[DEBUG] GuardAgent.step() - Starting execution cycle")
-        if self.state == GuardState.IDLE:
-            self.handle_suspicious_report()
-
-        if self.state == GuardState.INVESTIGATING:
-            # move the drone to the suspicious camera
-            if self.drone.status == DroneState.IDLE and not self.moved_drone:
-                print("[DEBUG] GuardAgent.step() - Moving drone to suspicious camera")
-                # call this once to start moving
-                self.moved_drone = True
-                self.drone.move_to(self.suspicious_camera)
-
-            if self.drone.status == DroneState.IDLE and self.moved_drone:
-                print("[DEBUG] GuardAgent.step() - Drone moved to suspicious camera")
-                self.moved_drone = False # reset
-
-                # this means the drone has moved to the expected location
-                # so we can look at the images and make a decision\
-                print("[DEBUG] GuardAgent.step() - Analyzing images")
+        self.handle_suspicious_report()
+        self.dispatch_drones()
+
+        now = time.monotonic()
+        arrived = []
+        for drone_id, incident in self.incidents.dispatched.items():
+            drone = self.drone.fleet.get(drone_id)
+            # the drone may first finish a patrol move, only the
+            # arrival of the move sent for the incident counts
+            if drone.moves_reached >= incident.move_id:
+                arrived.append(incident)
+            elif incident.eta is not None and now >= incident.eta and incident.prefetch is None:
+                # the drone should be about to arrive, warm up the
+                # analysis of its camera so the decision is quick
+                print(f"[DEBUG] GuardAgent.step() - Prefetching drone camera analysis for {drone_id}")
                 self.drone.handle_camera_events()
-                self.drone.analyze_images()
-
-                score = self.drone.analisis_scores[self.drone.drone_camera]
-                # only check drone camera to confirm
-                if score > 0.5:
-                    print("[DEBUG] GuardAgent.step() - Suspicious activity detected in drone camera")
-                    # alarm should be triggered
-                    self.trigger_alarm()
-
-                print("[DEBUG] GuardAgent.step() - Sending control ended message")
-                # let the drone know we're done
-                msg = Message(
-                    code=MessageCode.CONTROL_ENDED,
-                    message="",
-                    sender=self
-                )             
-
-                print("[DEBUG] GuardAgent.step() - Changing state to IDLE")
-                self.drone.message_box_append(msg)
-                self.state = GuardState.IDLE   
+                incident.prefetch = self.drone.analyze_camera(drone.camera_id)
+                if incident.prefetch is not None:
+                    incident.prefetch_frame = self.drone.cameras.get(drone.camera_id).image
+
+        if arrived:
+            # this means the drones have moved to the expected locations
+            # so we can look at the images and make a decision
+            print("[DEBUG] GuardAgent.step() - Analyzing images")
+            self.drone.handle_camera_events()
+
+        # only check drone camera to confirm, start every analysis
+        # before waiting on any of them
+        analyses = {incident.drone_id: self.confirm_analysis(incident) for incident in arrived}
+
+        for incident in arrived:
+            drone_id = incident.drone_id
+            print(f"[DEBUG] GuardAgent.step() - Drone {drone_id} moved to suspicious camera {incident.camera_id}")
+
+            analysis = analyses[drone_id]
+            score = analysis.result() if analysis is not None else None
+            alarmed = score is not None and score > 0.5
+            if alarmed:
+                print("[DEBUG] GuardAgent.step() - Suspicious activity detected in drone camera")
+                # alarm should be triggered
+                self.trigger_alarm()
+
+            self.incidents.resolve(incident, alarmed)
+
+            print("[DEBUG] GuardAgent.step() - Sending control ended message")
+            # let the drone know we're done
+            msg = Message(
+                code=MessageCode.CONTROL_ENDED,
+                message=drone_id,
+                sender=self
+            )
+            self.drone.message_box_append(msg)
+
+        self.state = GuardState.INVESTIGATING if self.incidents.dispatched else GuardState.IDLE
+
+
+    def confirm_analysis(self, incident: Incident):
+        """
+        Future of the score of the drone camera at arrival. The prefetched
+        analysis is reused if no newer frame came in since, otherwise it
+        is dropped and the latest frame is analyzed.
+        """
+        camera_id = self.drone.fleet.get(incident.drone_id).camera_id
+        prefetch, incident.prefetch = incident.prefetch, None
+        if prefetch is not None:
+            if self.drone.cameras.get(camera_id).image is incident.prefetch_frame:
+                print(f"[DEBUG] GuardAgent.confirm_analysis() - Using prefetched analysis for {incident.drone_id}")
+                return prefetch
+
+            # a request already sent keeps running, its result is ignored
+            prefetch.cancel()
+
+        return self.drone.analyze_camera(camera_id)
+
+
+    def dispatch_drones(self):
+        # send the nearest available drone to the most urgent incidents,
+        # anything left stays queued until a drone is released
+        while self.incidents.can_dispatch():
+            incident = self.incidents.peek()
+            if incident is None:
+                return
+
+            # travel time grows with distance, so the nearest
+            # drone is also the one with the earliest arrival
+            drone = self.drone.fleet.nearest_available(self.drone.cameras.pose(incident.camera_id))
+            if drone is None:
+                return
+
+            print(f"[DEBUG] GuardAgent.dispatch_drones() - Moving drone {drone.id} to suspicious camera {incident.camera_id}")
+
+            # request control of the drone
+            msg = Message(
+                code=MessageCode.CONTROL_REQUEST,
+                message=drone.id,
+                sender=self
+            )
+            self.drone.message_box_append(msg)
+            travel_time = self.drone.move_to(incident.camera_id, drone.id)
+            self.incidents.dispatch(incident, drone.id, drone.moves_sent, travel_time)
+
     
     def trigger_alarm(self):
         self.serverconn.send_event(Events.ALARM.value, ["17"])
@@ -364,21 +700,32 @@ class GuardAgent():
         while self.messages:
             msg = self.messages.pop(0)
             if msg.code == MessageCode.SUSPICIOUS_ACTIVITY:
+                # overlapping cameras see the same scene, one incident
+                # (and one drone) covers them all
+                camera_id = self.covering_camera(msg.message)
+                # repeated reports only refresh the open incident
+                if self.incidents.report(camera_id, self.drone.cameras.score(camera_id) or 0.0) is None:
+                    continue
+
                 print("[DEBUG] GuardAgent.handle_suspicious_report() - Handling suspicious report")
-                self.state = GuardState.INVESTIGATING
-                self.suspicious_camera = msg.message
-                # request control of the drone
-                msg = Message(
-                    code=MessageCode.CONTROL_REQUEST,
-                    message="",
-                    sender=self
-                )
-                self.drone.message_box_append(msg)
-                self.serverconn.send_event(Events.SUSPICIOUS_ACTIVITY_STARTED.value, [datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), msg.message])
+                self.serverconn.send_event(Events.SUSPICIOUS_ACTIVITY_STARTED.value, [datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), camera_id])
             else:
                 print("[WARN]: Unknown message code:", msg.code)
 
 
+    def covering_camera(self, camera_id: str) -> str:
+        """Closest camera overlapping camera_id with an open incident, camera_id itself if there is none"""
+        if camera_id in self.incidents.open or camera_id not in self.drone.cameras:
+            return camera_id
+
+        pose = self.drone.cameras.pose(camera_id)
+        for other in self.drone.cameras.within(pose, self.drone.overlap_radius):
+            if other in self.incidents.open:
+                return other
+
+        return camera_id
+
+
     def message_box_append(self, message):
         self.messages.append(message)
 
@@ -419,112 +766,132 @@ class Stats:
             'suspicious_activities': self.suspicious_activities
         }
 
-    def create_response_time_graph(self):
-        """Creates a graph showing response times between suspicious activities and alarms"""
-        import matplotlib.pyplot as plt
-        from datetime import timedelta
-
-        response_times = []
-        false_positives = []
-        matched_alarms = set()
-
-        # Calculate response times and identify false positives
-        for alarm in self.alarm_events:
-            alarm_time = alarm['timestamp']
-            # Find the closest previous suspicious activity
-            closest_activity = None
-            min_time_diff = timedelta(minutes=5)  # Max 5 minutes response time threshold
-
-            for activity in self.suspicious_activities:
-                if activity['timestamp'] < alarm_time:
-                    time_diff = alarm_time - activity['timestamp']
-                    if time_diff < min_time_diff:
-                        min_time_diff = time_diff
-                        closest_activity = activity
-
-            if closest_activity:
-                response_times.append((len(response_times), min_time_diff.total_seconds()))
-                matched_alarms.add(alarm_time)
-            else:
-                false_positives.append(alarm_time)
-
-        # Create response time graph
-        plt.figure(figsize=(12, 6))
-        if response_times:
-            x, y = zip(*response_times)
-            plt.plot(x, y, 'b-', label='Response Time')
-            
-            # Calculate and plot average response time
-            avg_response_time = sum(y) / len(y)
-            plt.axhline(y=avg_response_time, color='r', linestyle='--', 
-                       label=f'Average: {avg_response_time:.2f}s')
-        
-        plt.xlabel("Alarm Number")
-        plt.ylabel("Response Time (seconds)")
-        plt.title("Alarm Response Times")
-        plt.legend()
-        plt.grid(True)
-        plt.savefig("response_times.png")
-        plt.close()
-
-        # Create false positives graph
-        plt.figure(figsize=(8, 6))
-        labels = ['Valid Alarms', 'False Positives']
-        sizes = [len(matched_alarms), len(false_positives)]
-        colors = ['lightgreen', 'lightcoral']
-        
-        plt.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%')
-        plt.title("Alarm Accuracy Analysis")
-        plt.savefig("false_positives.png")
-        plt.close()
+    def save(self, path: str, incidents: list[Incident] = (), **meta):
+        """Persist the run for the reporting command (python -m server.report)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        save_run(
+            path,
+            alarms=[alarm['timestamp'].timestamp() for alarm in self.alarm_events],
+            activities=[activity['timestamp'].timestamp() for activity in self.suspicious_activities],
+            activity_cameras=[activity['data'][1] if len(activity['data']) > 1 else "" for activity in self.suspicious_activities],
+            incidents=incidents,
+            **meta,
+        )
+        print(f"[STATS] Run saved to {path}")
 
-        return {
-            'average_response_time': sum(y for _, y in response_times) / len(response_times) if response_times else 0,
-            'false_positive_rate': len(false_positives) / len(self.alarm_events) if self.alarm_events else 0,
-            'total_alarms': len(self.alarm_events),
-            'valid_alarms': len(matched_alarms),
-            'false_positives': len(false_positives)
-        }
+    def get_alarm_summary(self):
+        """Response times and false positives, see server/models/runlog.py"""
+        return summarize(
+            [alarm['timestamp'].timestamp() for alarm in self.alarm_events],
+            [activity['timestamp'].timestamp() for activity in self.suspicious_activities],
+        )
 
 
 class Simulation():
-    def __init__(self, iterations=1000, dt=1):
-        self.serverconn = EventEmitter()
-        self.drone = DroneAgent(self.serverconn)
+    def __init__(self, iterations=1000, dt=1, metrics_port: int | None = 9100, stats_path: str | None = None):
+        self.metrics = Metrics()
+        # frames beyond these are dropped oldest first, the flow control
+        # credits keep the cameras from getting there in the first place.
+        # moves are never coalesced: Unity queues every move_to and the
+        # drones count them to tell arrivals apart
+        self.serverconn = EventEmitter(
+            queue_limits={
+                Events.CAMERA_CAPTURE.value: 256,
+                Events.DRONE_CAMERA_CAPTURE.value: 64,
+            },
+            metrics=self.metrics,
+        )
+        self.drone = DroneAgent(self.serverconn, metrics=self.metrics)
         self.guard = GuardAgent(self.drone, self.serverconn)
         self.stats = Stats(self.serverconn)  # Initialize stats tracking
         self.iterations = iterations
         self.current_iterations = 0
         self.dt = dt
+        self.stats_path = stats_path or datetime.datetime.now().strftime("runs/run-%Y%m%d-%H%M%S.npz")
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics_server = MetricsServer(self.metrics, metrics_port) if metrics_port is not None else None
         print(f"[DEBUG] Simulation initialized with {iterations} iterations, dt={dt}")
     
+    def collect_metrics(self, metrics: Metrics):
+        """Sample the state that is read on scrape instead of tracked"""
+        for event_type, count in list(self.serverconn.event_counts.items()):
+            metrics.set("events_received_total", count, kind="counter", type=event_type)
+        for event_type, queue in list(self.serverconn.event_queues.items()):
+            metrics.set("event_queue_depth", queue.qsize(), type=event_type)
+        for event_type, count in list(self.serverconn.event_drops.items()):
+            metrics.set("events_dropped_total", count, kind="counter", type=event_type)
+
+        metrics.set("send_queue_depth", self.serverconn.outbox_depth())
+        metrics.set("events_sent_total", self.serverconn.sent, kind="counter")
+        metrics.set("events_coalesced_total", self.serverconn.coalesced, kind="counter")
+        metrics.set("send_dropped_total", self.serverconn.send_drops, kind="counter")
+
+        flow = self.drone.flow.get_stats()
+        metrics.set("capture_credits_outstanding", flow['outstanding'])
+        metrics.set("capture_unsolicited_total", flow['unsolicited'], kind="counter")
+        metrics.set("capture_grants_stalled_total", flow['stalled'], kind="counter")
+
+        for drone in list(self.drone.fleet.drones.values()):
+            metrics.set("drone_busy", int(drone.status == DroneState.BUSY), drone=drone.id)
+            metrics.set("drone_controlled", int(drone.mode == DroneMode.CONTROLLED), drone=drone.id)
+
+        incidents = self.guard.incidents
+        metrics.set("incidents_queued", incidents.queued())
+        metrics.set("incidents_dispatched", len(incidents.dispatched))
+        metrics.set("incidents_resolved_total", len(incidents.resolved), kind="counter")
+        metrics.set("motion_gate_pass_ratio", self.drone.motion_gate.pass_rate())
+        metrics.set("dispatches_avoided_total", self.drone.score_filter.suppressed, kind="counter")
+
     def run(self):
         print("[DEBUG] Starting simulation")
+        self.serverconn.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
         
         while self.current_iterations < self.iterations:
+            tick_start = time.perf_counter()
             self.drone.step()
             self.guard.step()
             self.stats.update_stats()  # Update stats each iteration
+            self.metrics.observe("tick_duration_seconds", time.perf_counter() - tick_start)
             
             self.current_iterations += 1
             time.sleep(self.dt)
 
+        self.drone.frame_decoder.shutdown()
+        self.serverconn.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+
         stats_summary = self.stats.get_stats_summary()
-        response_time_graph = self.stats.create_response_time_graph()
+        alarm_summary = self.stats.get_alarm_summary()
+        self.stats.save(
+            self.stats_path,
+            incidents=self.guard.incidents.resolved + list(self.guard.incidents.open.values()),
+            iterations=self.current_iterations,
+            dt=self.dt,
+            motion_pass_rate=self.drone.motion_gate.pass_rate(),
+            dispatches_avoided=self.drone.score_filter.suppressed,
+        )
         print("[DEBUG] Simulation completed")
         
         # Print key metrics
         print("\n=== Simulation Results ===")
-        print(f"Total Alarms: {response_time_graph['total_alarms']}")
-        print(f"Valid Alarms: {response_time_graph['valid_alarms']}")
-        print(f"False Positives: {response_time_graph['false_positives']}")
-        print(f"False Positive Rate: {response_time_graph['false_positive_rate']*100:.1f}%")
-        if response_time_graph['average_response_time'] > 0:
-            print(f"Average Response Time: {response_time_graph['average_response_time']:.2f} seconds")
+        print(f"Total Alarms: {alarm_summary['total_alarms']}")
+        print(f"Valid Alarms: {alarm_summary['valid_alarms']}")
+        print(f"False Positives: {alarm_summary['false_positives']}")
+        print(f"False Positive Rate: {alarm_summary['false_positive_rate']*100:.1f}%")
+        if alarm_summary['average_response_time'] > 0:
+            print(f"Average Response Time: {alarm_summary['average_response_time']:.2f} seconds")
         print(f"Total Suspicious Activities: {stats_summary['total_suspicious_activities']}")
+        print(f"Motion Gate Pass Rate: {self.drone.motion_gate.pass_rate()*100:.1f}%")
+        print(f"Dispatches Avoided: {self.drone.score_filter.suppressed}")
+        print(f"Patrol Waypoints Visited: {self.drone.patrol.visits}")
+        print(f"Average Expected Drone Wait: {self.guard.incidents.expected_wait():.2f} seconds")
+        print(f"Report: python -m server.report {self.stats_path}")
         print("=======================\n")
         
-        return stats_summary, response_time_graph
+        return stats_summary, alarm_summary
 
 
 if __name__ == "__main__":
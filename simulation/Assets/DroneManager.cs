@@ -6,6 +6,7 @@ public class DroneManager : MonoBehaviour
 {
     public GameObject dronePrefab;
     public SplineContainer spline;
+    public string droneId; // Id reported to the server, defaults to the drone object name
     private float speed = 10f;
     private float pauseDuration = 8f; // Time to pause at the destination
     private float returnToSplineSpeed = 10f;
@@ -32,6 +33,11 @@ public class DroneManager : MonoBehaviour
     {
         Animator animator = dronePrefab.GetComponent<Animator>(); // Get the animator component
 
+        if (string.IsNullOrEmpty(droneId))
+        {
+            droneId = dronePrefab.name; // Same name the drone camera reports as camera id
+        }
+
         animator.SetBool("isSleeping", false); // Set the isSleeping parameter to false to make the drone take off from the drone port
         animator.SetBool("isFlying", true); // Set the isFlying parameter to true to make the drone fly
 
@@ -45,6 +51,9 @@ public class DroneManager : MonoBehaviour
         SocketClient connection = SocketClient.Instance;
         connection.HandleEvent("move_to", (string[] data) =>
         {
+            // Movements addressed to another drone of the fleet are ignored
+            if (data.Length > 7 && data[7] != droneId) return;
+
             float x = float.Parse(data[0]);
             float y = float.Parse(data[1]);
             float z = float.Parse(data[2]);
@@ -89,12 +98,12 @@ public class DroneManager : MonoBehaviour
             // make sure the drone's rotation is correct
             dronePrefab.transform.rotation = currentMovement.rotation;
 
-            SocketClient.Instance.SendEvent("drone_status_update", new string[] { "IDLE" });
+            SocketClient.Instance.SendEvent("drone_status_update", new string[] { droneId, "IDLE" });
             currentState = DroneState.Pausing;
             pauseTimer = pauseDuration;
         }else if (Vector3.Distance(dronePrefab.transform.position, currentMovement.destination) < 0.2f && currentMovement.type == "return_to_base") 
         {
-            SocketClient.Instance.SendEvent("drone_status_update", new string[] { "BUSY" });
+            SocketClient.Instance.SendEvent("drone_status_update", new string[] { droneId, "BUSY" });
             animator.SetBool("isFlying", false); // Set the isSleeping parameter to true to make the drone land on the drone port
             animator.SetBool("isSleeping", true); // Set the isSleeping parameter to true to make the drone land on the drone port
         }
@@ -114,7 +123,7 @@ public class DroneManager : MonoBehaviour
         if (pauseTimer <= 0f)
         {
             currentState = DroneState.ReturningToSpline;
-            SocketClient.Instance.SendEvent("drone_status_update", new string[] { "BUSY" });
+            SocketClient.Instance.SendEvent("drone_status_update", new string[] { droneId, "BUSY" });
         }
     }
 
@@ -124,7 +133,7 @@ public class DroneManager : MonoBehaviour
         if (Vector3.Distance(dronePrefab.transform.position, closestPointOnSpline) < 0.1f)
         {
             currentState = DroneState.FollowingSpline;
-            SocketClient.Instance.SendEvent("drone_status_update", new string[] { "IDLE" });
+            SocketClient.Instance.SendEvent("drone_status_update", new string[] { droneId, "IDLE" });
             movements.RemoveAt(0);
         }
         else
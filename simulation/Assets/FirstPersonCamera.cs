@@ -2,6 +2,7 @@ using System.Collections.Generic;
 using System.IO;
 using UnityEngine;
 using System;
+using System.Globalization;
 
 public class CameraManager : MonoBehaviour
 {
@@ -40,6 +41,9 @@ public class RobotCameraController : MonoBehaviour
     private int imageWidth;
     private int imageHeight;
     private string cameraName;
+    // frames the server allows us to send, -1 until the server
+    // sends its first credits (older servers never do)
+    private int credits = -1;
 
     public void Initialize(float captureInterval, int imageWidth, int imageHeight)
     {
@@ -69,6 +73,19 @@ public class RobotCameraController : MonoBehaviour
         fpCamera.fieldOfView = 60; // Standard FOV, adjust as needed
 
         timer = captureInterval; // Initialize the timer
+
+        // The server grants credits and the capture interval it can keep up with
+        SocketClient.Instance.HandleEvent("capture_credits", OnCaptureCredits);
+    }
+
+    private void OnCaptureCredits(string[] data)
+    {
+        // data: camera_id, credits, interval
+        if (data[0] != cameraName && data[0] != "*") return;
+
+        credits = Math.Max(credits, 0) + int.Parse(data[1], CultureInfo.InvariantCulture);
+        captureInterval = float.Parse(data[2], CultureInfo.InvariantCulture);
+        timer = Math.Min(timer, captureInterval);
     }
 
     private void Update()
@@ -76,9 +93,12 @@ public class RobotCameraController : MonoBehaviour
         // Update timer
         timer -= Time.deltaTime;
 
-        if (timer <= 0f)
+        // Without credits the frame is not even rendered, the timer
+        // stays expired so the capture happens as soon as one arrives
+        if (timer <= 0f && credits != 0)
         {
             CaptureImage();
+            if (credits > 0) credits--;
             timer = captureInterval; // Reset timer
         }
     }